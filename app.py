@@ -4,22 +4,92 @@ ANBD System - Flask Backend with Database Integration
 Handles start/stop from frontend, generates logs, saves to DB, sends WebSocket updates
 """
 
+# Patch the stdlib before anything else imports socket/threading/time
+import eventlet
+eventlet.monkey_patch()
+
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO, emit
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import json
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+import numpy as np
+import orjson
 import random
-import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from itertools import chain
 from typing import Dict, List, Any
 import uuid
 import os
-import pytz
-
-# Sri Lanka timezone
-SRI_LANKA_TZ = pytz.timezone('Asia/Colombo')
+import sqlite3
+import zlib
+
+# Sri Lanka timezone (fixed UTC+05:30, no DST since 1996)
+SRI_LANKA_TZ = timezone(timedelta(hours=5, minutes=30), '+0530')
+
+
+def utc_now():
+    """Current time in UTC, used for every timestamp written to the DB"""
+    return datetime.now(timezone.utc)
+
+
+# Flow feature ranges for the log generator: (name, low, high, decimals)
+FLOAT_FEATURE_RANGES = (
+    ('Flow Duration', 0.1, 30.0, 3),
+    ('Fwd Packet Length Max', 64, 1500, 2),
+    ('Fwd Packet Length Mean', 200, 1000, 2),
+    ('Fwd Packet Length Std', 50, 300, 2),
+    ('Bwd Packet Length Max', 64, 1500, 2),
+    ('Bwd Packet Length Mean', 200, 800, 2),
+    ('Bwd Packet Length Std', 50, 250, 2),
+    ('Flow Bytes/s', 100, 10000000, 2),
+    ('Flow Packets/s', 1, 10000, 2),
+    ('Flow IAT Mean', 0.001, 5.0, 4),
+    ('Flow IAT Std', 0.001, 2.0, 4),
+    ('Flow IAT Max', 0.1, 10.0, 3),
+    ('Flow IAT Min', 0.0001, 0.1, 4),
+    ('Fwd IAT Total', 0.1, 100.0, 3),
+    ('Fwd Header Length', 20, 60, 2),
+    ('Bwd Header Length', 20, 60, 2),
+    ('Min Packet Length', 64, 200, 2),
+    ('Max Packet Length', 1000, 1500, 2),
+    ('Packet Length Mean', 300, 800, 2),
+    ('Packet Length Std', 100, 400, 2),
+    ('Packet Length Variance', 10000, 160000, 2),
+    ('Down/Up Ratio', 0.1, 5.0, 3),
+    ('Average Packet Size', 200, 1200, 2),
+    ('Avg Bwd Segment Size', 200, 1000, 2),
+    ('Idle Mean', 0.1, 10.0, 3),
+    ('Idle Max', 1.0, 50.0, 3),
+    ('Idle Min', 0.01, 1.0, 4)
+)
+
+# Integer flow features: (name, low, high), bounds inclusive
+INT_FEATURE_RANGES = (
+    ('Total Fwd Packets', 1, 1000),
+    ('Total Backward Packets', 1, 500),
+    ('Total Length of Fwd Packets', 64, 65535),
+    ('Total Length of Bwd Packets', 64, 32768),
+    ('ACK Flag Count', 0, 100),
+    ('Subflow Fwd Bytes', 64, 65535),
+    ('Init_Win_bytes_forward', 8192, 65536),
+    ('Init_Win_bytes_backward', 8192, 65536)
+)
+
+DST_PORTS = (22, 23, 53, 80, 443, 993, 995, 3306, 5432, 8080)
+
+# Column-wise views of the ranges so one draw covers a whole feature block
+_FLOAT_FEATURE_NAMES = tuple(name for name, _, _, _ in FLOAT_FEATURE_RANGES)
+_FLOAT_LOWS = np.array([low for _, low, _, _ in FLOAT_FEATURE_RANGES])
+_FLOAT_HIGHS = np.array([high for _, _, high, _ in FLOAT_FEATURE_RANGES])
+_FLOAT_SCALES = 10.0 ** np.array([decimals for _, _, _, decimals in FLOAT_FEATURE_RANGES])
+
+_INT_FEATURE_NAMES = tuple(name for name, _, _ in INT_FEATURE_RANGES)
+_INT_LOWS = np.array([low for _, low, _ in INT_FEATURE_RANGES])
+_INT_HIGHS = np.array([high for _, _, high in INT_FEATURE_RANGES])
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -29,7 +99,23 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Initialize extensions
 db = SQLAlchemy(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+
+
+# Tune SQLite for a concurrent writer (generator) and readers (dashboard)
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256MB
+    cursor.execute("PRAGMA cache_size=-64000")  # ~64MB
+    cursor.close()
+
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 CORS(app, origins=["http://localhost:*", "file://*", "http://127.0.0.1:*"])
 
 
@@ -42,43 +128,94 @@ def after_request(response):
     return response
 
 
+def make_json_response(payload, status=200):
+    """Serialize payload with orjson for high-fanout endpoints"""
+    return app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
+
+
+def row_payload(row_id, row, features):
+    """Build the to_dict() payload for a row inserted through Core"""
+    payload = serialize_row(dict(row, id=row_id))
+    payload['features'] = features
+    return payload
+
+
+def uuid_str(value):
+    """Render a stored 16-byte UUID in canonical form (legacy rows hold text)"""
+    return str(uuid.UUID(bytes=value)) if isinstance(value, bytes) else value
+
+
+def pack_features(features):
+    """Compress a features dict for the feature side tables"""
+    return zlib.compress(orjson.dumps(features))
+
+
+def unpack_features(blob):
+    """Inverse of pack_features; missing blobs read as no features"""
+    return orjson.loads(zlib.decompress(blob)) if blob else {}
+
+
+def serialize_row(mapping):
+    """Serialize stored column values (ORM attributes or a Core row mapping)"""
+    payload = dict(mapping)
+    payload['timestamp'] = payload['timestamp'].replace(tzinfo=timezone.utc).astimezone(SRI_LANKA_TZ).isoformat()
+    payload['created_at'] = payload['created_at'].replace(tzinfo=timezone.utc).astimezone(SRI_LANKA_TZ).isoformat()
+    payload['log_id'] = uuid_str(payload['log_id'])
+    if 'anomaly_id' in payload:
+        payload['anomaly_id'] = uuid_str(payload['anomaly_id'])
+    if 'features' in payload:
+        payload['features'] = unpack_features(payload['features'])
+    return payload
+
+
 # Database Models
 class Event(db.Model):
     __tablename__ = 'events'
+    __table_args__ = (
+        db.Index('ix_events_created_status', 'created_at', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    log_id = db.Column(db.String(36), unique=True, nullable=False)
-    timestamp = db.Column(db.DateTime, default=lambda: datetime.now(SRI_LANKA_TZ), nullable=False)
+    log_id = db.Column(db.LargeBinary(16), unique=True, nullable=False)  # uuid4().bytes
+    timestamp = db.Column(db.DateTime, default=utc_now, nullable=False)
     src_ip = db.Column(db.String(15), nullable=False)
     dst_ip = db.Column(db.String(15), nullable=False)
     src_port = db.Column(db.Integer, nullable=False)
     dst_port = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(20), default='normal', nullable=False)
-    features = db.Column(db.Text, nullable=True)  # JSON string of features
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(SRI_LANKA_TZ))
+    created_at = db.Column(db.DateTime, default=utc_now)
+
+    # Features live in event_features so list queries scan a narrow table
+    features_row = db.relationship('EventFeatures', uselist=False, lazy='select')
+
+    # Serialized keys, in to_dict order (all stored columns)
+    _KEYS = ('id', 'log_id', 'timestamp', 'src_ip', 'dst_ip', 'src_port', 'dst_port', 'status', 'created_at')
+
+    def to_dict(self, include_features=False):
+        mapping = dict(zip(self._KEYS, [getattr(self, key) for key in self._KEYS]))
+        if include_features:
+            mapping['features'] = self.features_row.blob if self.features_row else None
+        return serialize_row(mapping)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'log_id': self.log_id,
-            'timestamp': self.timestamp.astimezone(SRI_LANKA_TZ).isoformat(),
-            'src_ip': self.src_ip,
-            'dst_ip': self.dst_ip,
-            'src_port': self.src_port,
-            'dst_port': self.dst_port,
-            'status': self.status,
-            'features': json.loads(self.features) if self.features else {},
-            'created_at': self.created_at.astimezone(SRI_LANKA_TZ).isoformat()
-        }
+
+class EventFeatures(db.Model):
+    __tablename__ = 'event_features'
+
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), primary_key=True)
+    blob = db.Column(db.LargeBinary, nullable=False)  # pack_features() output
 
 
 class Response(db.Model):
     __tablename__ = 'responses'
+    __table_args__ = (
+        db.Index('ix_responses_created_type1', 'created_at', 'anomaly_type1'),
+        db.Index('ix_responses_created_type2', 'created_at', 'anomaly_type2'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    log_id = db.Column(db.String(36), nullable=False)
-    anomaly_id = db.Column(db.String(36), unique=True, nullable=False)
-    timestamp = db.Column(db.DateTime, default=lambda: datetime.now(SRI_LANKA_TZ), nullable=False)
+    log_id = db.Column(db.LargeBinary(16), nullable=False)  # uuid4().bytes of the event
+    anomaly_id = db.Column(db.LargeBinary(16), unique=True, nullable=False)  # uuid4().bytes
+    timestamp = db.Column(db.DateTime, default=utc_now, nullable=False)
     src_ip = db.Column(db.String(15), nullable=False)
     dst_ip = db.Column(db.String(15), nullable=False)
     src_port = db.Column(db.Integer, nullable=False)
@@ -87,32 +224,31 @@ class Response(db.Model):
     anomaly_type2 = db.Column(db.String(50), nullable=True)
     res_type1 = db.Column(db.String(50), nullable=True)
     res_type2 = db.Column(db.String(50), nullable=True)
-    features = db.Column(db.Text, nullable=True)  # JSON string of reFeatures
     confidence_score = db.Column(db.Float, nullable=True)
     execution_time = db.Column(db.Float, nullable=True)
     status = db.Column(db.String(20), default='success', nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(SRI_LANKA_TZ))
+    created_at = db.Column(db.DateTime, default=utc_now)
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'log_id': self.log_id,
-            'anomaly_id': self.anomaly_id,
-            'timestamp': self.timestamp.astimezone(SRI_LANKA_TZ).isoformat(),
-            'src_ip': self.src_ip,
-            'dst_ip': self.dst_ip,
-            'src_port': self.src_port,
-            'dst_port': self.dst_port,
-            'anomaly_type1': self.anomaly_type1,
-            'anomaly_type2': self.anomaly_type2,
-            'res_type1': self.res_type1,
-            'res_type2': self.res_type2,
-            'features': json.loads(self.features) if self.features else {},
-            'confidence_score': self.confidence_score,
-            'execution_time': self.execution_time,
-            'status': self.status,
-            'created_at': self.created_at.astimezone(SRI_LANKA_TZ).isoformat()
-        }
+    # reFeatures live in response_features so list queries scan a narrow table
+    features_row = db.relationship('ResponseFeatures', uselist=False, lazy='select')
+
+    # Serialized keys, in to_dict order (all stored columns)
+    _KEYS = ('id', 'log_id', 'anomaly_id', 'timestamp', 'src_ip', 'dst_ip', 'src_port', 'dst_port',
+             'anomaly_type1', 'anomaly_type2', 'res_type1', 'res_type2', 'confidence_score',
+             'execution_time', 'status', 'created_at')
+
+    def to_dict(self, include_features=False):
+        mapping = dict(zip(self._KEYS, [getattr(self, key) for key in self._KEYS]))
+        if include_features:
+            mapping['features'] = self.features_row.blob if self.features_row else None
+        return serialize_row(mapping)
+
+
+class ResponseFeatures(db.Model):
+    __tablename__ = 'response_features'
+
+    response_id = db.Column(db.Integer, db.ForeignKey('responses.id', ondelete='CASCADE'), primary_key=True)
+    blob = db.Column(db.LargeBinary, nullable=False)  # pack_features() output of reFeatures
 
 
 # Log Generator Class
@@ -122,6 +258,19 @@ class ANBDLogGenerator:
         self.generation_thread = None
         self._start_time = None
         self._stop_time = None
+        self._rng = np.random.default_rng()
+
+        # Dedicated session factory for generator writes, bound on first use
+        self._session_factory = None
+
+        # In-memory statistics counters, seeded from the DB on first use
+        self._stats_seeded = False
+        self._stats_date = None
+        self._total_events = 0
+        self._total_responses = 0
+        self._total_anomalies = 0
+        self._events_today = 0
+        self._responses_today = 0
 
         # Network topology from your GNS3 setup
         self.network_devices = {
@@ -142,6 +291,13 @@ class ANBDLogGenerator:
             }
         }
 
+        # Flat IP table built once so event generation doesn't rebuild it
+        self._all_ips = tuple(chain(
+            chain.from_iterable(self.network_devices['routers'].values()),
+            chain.from_iterable(self.network_devices['end_devices'].values())
+        ))
+        self._num_ips = len(self._all_ips)
+
         # Anomaly types
         self.anomaly_type1_list = [
             'bandwidth_saturation', 'throughput_anomaly', 'unusual_header_length',
@@ -171,150 +327,179 @@ class ANBDLogGenerator:
             }
         }
 
+        # Flattened (anomaly type, response options) pairs so a response is two index draws per type
+        self._type1_choices = tuple(
+            (name, tuple(self.response_types['type1'][name])) for name in self.anomaly_type1_list
+        )
+        self._type2_choices = tuple(
+            (name, tuple(self.response_types['type2'][name])) for name in self.anomaly_type2_list
+        )
+
     def get_all_ips(self):
         """Get all IP addresses from topology"""
-        all_ips = []
-        for device_ips in self.network_devices['routers'].values():
-            all_ips.extend(device_ips)
-        for device_ips in self.network_devices['end_devices'].values():
-            all_ips.extend(device_ips)
-        return all_ips
+        return list(self._all_ips)
 
     def generate_realistic_features(self):
         """Generate realistic network flow features"""
-        return {
-            'Flow Duration': round(random.uniform(0.1, 30.0), 3),
-            'Total Fwd Packets': random.randint(1, 1000),
-            'Total Backward Packets': random.randint(1, 500),
-            'Total Length of Fwd Packets': random.randint(64, 65535),
-            'Total Length of Bwd Packets': random.randint(64, 32768),
-            'Fwd Packet Length Max': round(random.uniform(64, 1500), 2),
-            'Fwd Packet Length Mean': round(random.uniform(200, 1000), 2),
-            'Fwd Packet Length Std': round(random.uniform(50, 300), 2),
-            'Bwd Packet Length Max': round(random.uniform(64, 1500), 2),
-            'Bwd Packet Length Mean': round(random.uniform(200, 800), 2),
-            'Bwd Packet Length Std': round(random.uniform(50, 250), 2),
-            'Flow Bytes/s': round(random.uniform(100, 10000000), 2),
-            'Flow Packets/s': round(random.uniform(1, 10000), 2),
-            'Flow IAT Mean': round(random.uniform(0.001, 5.0), 4),
-            'Flow IAT Std': round(random.uniform(0.001, 2.0), 4),
-            'Flow IAT Max': round(random.uniform(0.1, 10.0), 3),
-            'Flow IAT Min': round(random.uniform(0.0001, 0.1), 4),
-            'Fwd IAT Total': round(random.uniform(0.1, 100.0), 3),
-            'Fwd Header Length': round(random.uniform(20, 60), 2),
-            'Bwd Header Length': round(random.uniform(20, 60), 2),
-            'Min Packet Length': round(random.uniform(64, 200), 2),
-            'Max Packet Length': round(random.uniform(1000, 1500), 2),
-            'Packet Length Mean': round(random.uniform(300, 800), 2),
-            'Packet Length Std': round(random.uniform(100, 400), 2),
-            'Packet Length Variance': round(random.uniform(10000, 160000), 2),
-            'ACK Flag Count': random.randint(0, 100),
-            'Down/Up Ratio': round(random.uniform(0.1, 5.0), 3),
-            'Average Packet Size': round(random.uniform(200, 1200), 2),
-            'Avg Bwd Segment Size': round(random.uniform(200, 1000), 2),
-            'Subflow Fwd Bytes': random.randint(64, 65535),
-            'Init_Win_bytes_forward': random.randint(8192, 65536),
-            'Init_Win_bytes_backward': random.randint(8192, 65536),
-            'Idle Mean': round(random.uniform(0.1, 10.0), 3),
-            'Idle Max': round(random.uniform(1.0, 50.0), 3),
-            'Idle Min': round(random.uniform(0.01, 1.0), 4)
-        }
+        return self.generate_feature_batch(1)[0]
+
+    def generate_feature_batch(self, count):
+        """Generate features for a whole batch with one draw per feature kind"""
+        floats = self._rng.uniform(_FLOAT_LOWS, _FLOAT_HIGHS, size=(count, len(_FLOAT_LOWS)))
+        floats = np.round(floats * _FLOAT_SCALES) / _FLOAT_SCALES
+        ints = self._rng.integers(_INT_LOWS, _INT_HIGHS, size=(count, len(_INT_LOWS)), endpoint=True)
+
+        batch = []
+        for float_row, int_row in zip(floats.tolist(), ints.tolist()):
+            features = dict(zip(_FLOAT_FEATURE_NAMES, float_row))
+            features.update(zip(_INT_FEATURE_NAMES, int_row))
+            batch.append(features)
+        return batch
 
     def generate_and_save_events(self):
-        """Generate events and save to database"""
-        with app.app_context():
+        """Generate a batch of events and save them in a single transaction"""
+        with app.app_context(), self._new_session() as session:
             try:
-                all_ips = self.get_all_ips()
                 num_events = random.randint(3, 8)  # Generate 3-8 events per batch
 
-                for _ in range(num_events):
-                    # Generate network event
-                    src_ip = random.choice(all_ips)
-                    dst_ip = random.choice([ip for ip in all_ips if ip != src_ip])
-                    src_port = random.randint(1024, 65535)
-                    dst_port = random.choice([22, 23, 53, 80, 443, 993, 995, 3306, 5432, 8080])
-
-                    # Determine if anomalous (25% chance)
-                    status = random.choices(['normal', 'anomalous'], weights=[75, 25], k=1)[0]
-
-                    features = self.generate_realistic_features()
-
-                    # Create and save event
-                    event = Event(
-                        log_id=str(uuid.uuid4()),
-                        src_ip=src_ip,
-                        dst_ip=dst_ip,
-                        src_port=src_port,
-                        dst_port=dst_port,
-                        status=status,
-                        features=json.dumps(features)
-                    )
+                # Determine which events are anomalous (25% chance each)
+                statuses = random.choices(['normal', 'anomalous'], weights=[75, 25], k=num_events)
 
-                    db.session.add(event)
-                    db.session.commit()
+                # One clock read per batch; every row in it shares the timestamp
+                now = utc_now()
 
-                    # Send event to frontend via WebSocket
-                    socketio.emit('new_event', event.to_dict())
+                event_rows = []
+                event_features = []
+                response_rows = []
+                response_features = []
 
-                    # If anomalous, generate response
+                for status, features in zip(statuses, self.generate_feature_batch(num_events)):
+                    # Generate network event
+                    src_idx = random.randrange(self._num_ips)
+                    src_ip = self._all_ips[src_idx]
+                    # Offset by 1..n-1 so the destination never equals the source
+                    dst_ip = self._all_ips[(src_idx + 1 + random.randrange(self._num_ips - 1)) % self._num_ips]
+                    src_port = random.randint(1024, 65535)
+                    dst_port = DST_PORTS[self._rng.integers(len(DST_PORTS))]
+
+                    # Build event row (inserted with the rest of the batch)
+                    event_row = {
+                        'log_id': uuid.uuid4().bytes,
+                        'timestamp': now,
+                        'src_ip': src_ip,
+                        'dst_ip': dst_ip,
+                        'src_port': src_port,
+                        'dst_port': dst_port,
+                        'status': status,
+                        'created_at': now
+                    }
+                    event_rows.append(event_row)
+                    event_features.append(features)
+
+                    # If anomalous, build response row
                     if status == 'anomalous':
-                        self.generate_and_save_response(event, features)
+                        response_row, re_features = self.build_response(event_row, features)
+                        response_rows.append(response_row)
+                        response_features.append(re_features)
 
-                    print(f"Generated event: {src_ip}:{src_port} -> {dst_ip}:{dst_port} ({status})")
+                # Core executemany inserts skip the ORM unit of work entirely
+                event_ids = self._insert_rows(session, Event, event_rows)
+                response_ids = self._insert_rows(session, Response, response_rows)
+                self._insert_features(session, EventFeatures, 'event_id', event_ids, event_features)
+                self._insert_features(session, ResponseFeatures, 'response_id', response_ids, response_features)
 
-            except Exception as e:
-                print(f"Error generating events: {e}")
-                db.session.rollback()
+                session.commit()
 
-    def generate_and_save_response(self, event, features):
-        """Generate response for anomalous event"""
-        with app.app_context():
-            try:
-                # Select anomaly types
-                anomaly_type1 = random.choice(self.anomaly_type1_list)
-                anomaly_type2 = random.choice(self.anomaly_type2_list)
-
-                # Select response types
-                res_type1 = random.choice(self.response_types['type1'][anomaly_type1])
-                res_type2 = random.choice(self.response_types['type2'][anomaly_type2])
-
-                # Extract reFeatures (subset of features)
-                re_features = {k: v for k, v in features.items() if k in [
-                    'Flow Duration', 'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
-                    'Flow Bytes/s', 'Flow Packets/s', 'Fwd Header Length', 'Bwd Header Length',
-                    'Max Packet Length', 'Packet Length Mean'
-                ]}
-
-                # Create response
-                response = Response(
-                    log_id=event.log_id,
-                    anomaly_id=str(uuid.uuid4()),
-                    timestamp=datetime.utcnow() + timedelta(seconds=random.randint(1, 30)),
-                    src_ip=event.src_ip,
-                    dst_ip=event.dst_ip,
-                    src_port=event.src_port,
-                    dst_port=event.dst_port,
-                    anomaly_type1=anomaly_type1,
-                    anomaly_type2=anomaly_type2,
-                    res_type1=res_type1,
-                    res_type2=res_type2,
-                    features=json.dumps(re_features),
-                    confidence_score=round(random.uniform(0.7, 0.99), 3),
-                    execution_time=round(random.uniform(0.5, 5.0), 2),
-                    status=random.choice(['success', 'partial', 'failed'])
+                self._record_batch(
+                    len(event_rows), len(response_rows), sum(1 for status in statuses if status == 'anomalous')
                 )
 
-                db.session.add(response)
-                db.session.commit()
+                event_dicts = [
+                    row_payload(row_id, row, row_features)
+                    for row_id, row, row_features in zip(event_ids, event_rows, event_features)
+                ]
+                response_dicts = [
+                    row_payload(row_id, row, row_features)
+                    for row_id, row, row_features in zip(response_ids, response_rows, response_features)
+                ]
 
-                # Send response to frontend via WebSocket
-                socketio.emit('new_response', response.to_dict())
+                # Send the whole batch to the frontend in one WebSocket message
+                socketio.emit('new_events_batch', {'events': event_dicts, 'responses': response_dicts})
 
-                print(f"Generated response: {anomaly_type1} + {anomaly_type2} -> {res_type1} + {res_type2}")
+                for event_dict in event_dicts:
+                    print(f"Generated event: {event_dict['src_ip']}:{event_dict['src_port']} -> "
+                          f"{event_dict['dst_ip']}:{event_dict['dst_port']} ({event_dict['status']})")
+
+                for response_dict in response_dicts:
+                    print(f"Generated response: {response_dict['anomaly_type1']} + {response_dict['anomaly_type2']} -> "
+                          f"{response_dict['res_type1']} + {response_dict['res_type2']}")
 
             except Exception as e:
-                print(f"Error generating response: {e}")
-                db.session.rollback()
+                print(f"Error generating events: {e}")
+                session.rollback()
+
+    def _new_session(self):
+        """Open a generator-owned session that keeps loaded state after commit"""
+        if self._session_factory is None:
+            self._session_factory = sessionmaker(bind=db.engine, expire_on_commit=False)
+        return self._session_factory()
+
+    @staticmethod
+    def _insert_rows(session, model, rows):
+        """Insert rows with one executemany and return their ids in order"""
+        if not rows:
+            return []
+
+        table = model.__table__
+        statement = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+        return session.execute(statement, rows).scalars().all()
+
+    @staticmethod
+    def _insert_features(session, features_model, key, ids, features_list):
+        """Insert compressed feature blobs for freshly inserted rows"""
+        if not ids:
+            return
+
+        session.execute(
+            features_model.__table__.insert(),
+            [{key: row_id, 'blob': pack_features(features)} for row_id, features in zip(ids, features_list)]
+        )
+
+    def build_response(self, event_row, features):
+        """Build a response row and its reFeatures for an anomalous event"""
+        # Select anomaly types together with their response options
+        anomaly_type1, res_options1 = self._type1_choices[random.randrange(len(self._type1_choices))]
+        anomaly_type2, res_options2 = self._type2_choices[random.randrange(len(self._type2_choices))]
+
+        # Select response types
+        res_type1 = res_options1[random.randrange(len(res_options1))]
+        res_type2 = res_options2[random.randrange(len(res_options2))]
+
+        # Extract reFeatures (subset of features)
+        re_features = {k: v for k, v in features.items() if k in [
+            'Flow Duration', 'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
+            'Flow Bytes/s', 'Flow Packets/s', 'Fwd Header Length', 'Bwd Header Length',
+            'Max Packet Length', 'Packet Length Mean'
+        ]}
+
+        response_row = {
+            'log_id': event_row['log_id'],
+            'anomaly_id': uuid.uuid4().bytes,
+            'timestamp': event_row['created_at'] + timedelta(seconds=random.randint(1, 30)),
+            'src_ip': event_row['src_ip'],
+            'dst_ip': event_row['dst_ip'],
+            'src_port': event_row['src_port'],
+            'dst_port': event_row['dst_port'],
+            'anomaly_type1': anomaly_type1,
+            'anomaly_type2': anomaly_type2,
+            'res_type1': res_type1,
+            'res_type2': res_type2,
+            'confidence_score': round(random.uniform(0.7, 0.99), 3),
+            'execution_time': round(random.uniform(0.5, 5.0), 2),
+            'status': random.choice(['success', 'partial', 'failed']),
+            'created_at': event_row['created_at']
+        }
+        return response_row, re_features
 
     def start_generation(self):
         """Start log generation with detailed status messages"""
@@ -364,9 +549,8 @@ class ANBDLogGenerator:
             'uptime': 0
         })
 
-        # Start generation thread
-        self.generation_thread = threading.Thread(target=self._generation_loop, daemon=True)
-        self.generation_thread.start()
+        # Start generation as a socketio background task on the eventlet hub
+        self.generation_thread = socketio.start_background_task(self._generation_loop)
 
         return True
 
@@ -409,8 +593,8 @@ class ANBDLogGenerator:
             'uptime': uptime
         })
 
-        if self.generation_thread:
-            self.generation_thread.join(timeout=5)
+        # The background task exits on its own once is_running is cleared
+        self.generation_thread = None
 
         return True
 
@@ -434,38 +618,71 @@ class ANBDLogGenerator:
                 socketio.emit('stats_update', stats)
 
                 # Wait 10-30 seconds before next batch
-                time.sleep(random.randint(10, 30))
+                socketio.sleep(random.randint(10, 30))
 
             except Exception as e:
                 print(f"Error in generation loop: {e}")
                 break
 
+    def _seed_statistics(self):
+        """Seed the statistics counters with a single DB query"""
+        today = datetime.now(SRI_LANKA_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+        today_utc = today.astimezone(timezone.utc)
+
+        with app.app_context():
+            counts = db.session.query(
+                db.session.query(db.func.count(Event.id)).scalar_subquery(),
+                db.session.query(db.func.count(Response.id)).scalar_subquery(),
+                db.session.query(db.func.count(Event.id)).filter(Event.created_at >= today_utc).scalar_subquery(),
+                db.session.query(db.func.count(Response.id)).filter(Response.created_at >= today_utc).scalar_subquery(),
+                db.session.query(db.func.count(Event.id)).filter(Event.status == 'anomalous').scalar_subquery()
+            ).one()
+
+        (self._total_events, self._total_responses, self._events_today,
+         self._responses_today, self._total_anomalies) = counts
+        self._stats_date = today.date()
+        self._stats_seeded = True
+
+    def _roll_statistics_day(self):
+        """Reset today's counters after midnight (Sri Lanka time)"""
+        today = datetime.now(SRI_LANKA_TZ).date()
+        if today != self._stats_date:
+            self._stats_date = today
+            self._events_today = 0
+            self._responses_today = 0
+
+    def _record_batch(self, num_events, num_responses, num_anomalies):
+        """Update the statistics counters after a committed batch"""
+        if not self._stats_seeded:
+            # Seeding reads the rows just committed, so nothing to add
+            self._seed_statistics()
+            return
+
+        self._roll_statistics_day()
+        self._total_events += num_events
+        self._total_responses += num_responses
+        self._total_anomalies += num_anomalies
+        self._events_today += num_events
+        self._responses_today += num_responses
+
     def get_statistics(self):
         """Get current system statistics"""
-        with app.app_context():
-            total_events = Event.query.count()
-            total_responses = Response.query.count()
-
-            # Today's stats
-            today = datetime.now(SRI_LANKA_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
-            events_today = Event.query.filter(Event.created_at >= today).count()
-            responses_today = Response.query.filter(Response.created_at >= today).count()
-
-            # Anomaly stats
-            anomalous_events = Event.query.filter_by(status='anomalous').count()
-
-            return {
-                'total_events': total_events,
-                'total_responses': total_responses,
-                'events_today': events_today,
-                'responses_today': responses_today,
-                'total_anomalies': anomalous_events,
-                'anomaly_rate': round((anomalous_events / max(total_events, 1)) * 100, 2),
-                'system_state': 'running' if self.is_running else 'stopped',
-                'last_update': datetime.now(SRI_LANKA_TZ).isoformat(),
-                'uptime': self.get_uptime(),
-                'start_time': self._start_time.isoformat() if self._start_time else None
-            }
+        if not self._stats_seeded:
+            self._seed_statistics()
+        self._roll_statistics_day()
+
+        return {
+            'total_events': self._total_events,
+            'total_responses': self._total_responses,
+            'events_today': self._events_today,
+            'responses_today': self._responses_today,
+            'total_anomalies': self._total_anomalies,
+            'anomaly_rate': round((self._total_anomalies / max(self._total_events, 1)) * 100, 2),
+            'system_state': 'running' if self.is_running else 'stopped',
+            'last_update': datetime.now(SRI_LANKA_TZ).isoformat(),
+            'uptime': self.get_uptime(),
+            'start_time': self._start_time.isoformat() if self._start_time else None
+        }
 
 
 # Initialize log generator
@@ -521,7 +738,7 @@ def get_dashboard_summary():
         stats = log_generator.get_statistics()
 
         # Add more detailed summary
-        yesterday = datetime.now() - timedelta(days=1)
+        yesterday = utc_now() - timedelta(days=1)
         recent_events = Event.query.filter(Event.created_at >= yesterday).count()
         recent_responses = Response.query.filter(Response.created_at >= yesterday).count()
 
@@ -583,55 +800,68 @@ def get_system_status():
         return jsonify({'error': str(e)}), 500
 
 
+def keyset_page(model, before_id, per_page, *criteria, include_features=False):
+    """Fetch one serialized page ordered by id DESC without counting the whole table"""
+    # Zero or negative sizes would break the cursor or (LIMIT -N) return every row
+    per_page = max(1, min(per_page, 100))
+    columns = model.__table__.c
+    statement = db.select(*[columns[key] for key in model._KEYS]).where(*criteria)
+    if include_features:
+        # Only join the wide blob table when the caller asked for it
+        features = model.features_row.property
+        statement = statement.add_columns(
+            features.mapper.local_table.c.blob.label('features')
+        ).outerjoin_from(model.__table__, features.mapper.local_table, features.primaryjoin)
+    if before_id is not None:
+        statement = statement.where(columns.id < before_id)
+
+    # Core row mappings skip ORM object materialization; one extra row tells us if more exist
+    rows = db.session.execute(statement.order_by(columns.id.desc()).limit(per_page + 1)).mappings().all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    return [serialize_row(row) for row in rows], {
+        'per_page': per_page,
+        'before_id': before_id,
+        'next_before_id': rows[-1]['id'] if has_more else None,
+        'has_more': has_more
+    }
+
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
-    """Get events with pagination"""
+    """Get events newest first, paged by id (pass next_before_id back as before_id, ?include=features for features)"""
     try:
-        page = request.args.get('page', 1, type=int)
+        before_id = request.args.get('before_id', type=int)
         per_page = request.args.get('per_page', 50, type=int)
         status = request.args.get('status')
+        include_features = 'features' in request.args.get('include', '').split(',')
 
-        query = Event.query
-        if status:
-            query = query.filter_by(status=status)
-
-        events = query.order_by(Event.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        criteria = [Event.status == status] if status else []
+        events, pagination = keyset_page(Event, before_id, per_page, *criteria, include_features=include_features)
 
-        return jsonify({
-            'events': [event.to_dict() for event in events.items],
-            'pagination': {
-                'page': events.page,
-                'pages': events.pages,
-                'per_page': events.per_page,
-                'total': events.total
-            }
-        }), 200
+        return make_json_response({
+            'events': events,
+            'pagination': pagination
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/responses', methods=['GET'])
 def get_responses():
-    """Get responses with pagination"""
+    """Get responses newest first, paged by id (pass next_before_id back as before_id, ?include=features for features)"""
     try:
-        page = request.args.get('page', 1, type=int)
+        before_id = request.args.get('before_id', type=int)
         per_page = request.args.get('per_page', 50, type=int)
+        include_features = 'features' in request.args.get('include', '').split(',')
 
-        responses = Response.query.order_by(Response.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        responses, pagination = keyset_page(Response, before_id, per_page, include_features=include_features)
 
-        return jsonify({
-            'responses': [response.to_dict() for response in responses.items],
-            'pagination': {
-                'page': responses.page,
-                'pages': responses.pages,
-                'per_page': responses.per_page,
-                'total': responses.total
-            }
-        }), 200
+        return make_json_response({
+            'responses': responses,
+            'pagination': pagination
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -641,7 +871,7 @@ def get_events_analytics():
     """Get events analytics for charts"""
     try:
         days = request.args.get('days', 7, type=int)
-        start_date = datetime.now(SRI_LANKA_TZ) - timedelta(days=days)
+        start_date = utc_now() - timedelta(days=days)
 
         # Events by status
         status_counts = db.session.query(
@@ -651,44 +881,38 @@ def get_events_analytics():
         # Create time series for last 24 hours
         time_series = []
         now = datetime.now(SRI_LANKA_TZ)
+        first_hour = (now - timedelta(hours=23)).replace(minute=0, second=0, microsecond=0)
+
+        # Count events per (Sri Lanka hour, status) in a single query
+        hour_bucket = db.func.strftime(
+            '%Y-%m-%d %H:00:00', Event.created_at, '+5 hours', '+30 minutes'
+        ).label('hour')
+        hourly_counts = db.session.query(
+            hour_bucket, Event.status, db.func.count(Event.id)
+        ).filter(Event.created_at >= first_hour.astimezone(timezone.utc)).group_by(hour_bucket, Event.status).all()
+
+        counts_by_hour = {}
+        for hour_key, status, count in hourly_counts:
+            counts_by_hour.setdefault(hour_key, {})[status] = count
 
         for i in range(23, -1, -1):  # Last 24 hours
-            hour_start = now - timedelta(hours=i)
-            hour_end = hour_start + timedelta(hours=1)
-            hour_key = hour_start.strftime('%Y-%m-%d %H:00:00')
-
-            # Count total events in this hour
-            total_events = Event.query.filter(
-                Event.created_at >= hour_start,
-                Event.created_at < hour_end
-            ).count()
-
-            # Count anomalous events in this hour
-            anomalous_events = Event.query.filter(
-                Event.created_at >= hour_start,
-                Event.created_at < hour_end,
-                Event.status == 'anomalous'
-            ).count()
-
-            # Count normal events in this hour
-            normal_events = Event.query.filter(
-                Event.created_at >= hour_start,
-                Event.created_at < hour_end,
-                Event.status == 'normal'
-            ).count()
+            hour_key = (now - timedelta(hours=i)).strftime('%Y-%m-%d %H:00:00')
+            hour_counts = counts_by_hour.get(hour_key, {})
+
+            total_events = sum(hour_counts.values())
 
             time_series.append({
                 'time': hour_key,
                 'total': total_events,
-                'normal': normal_events,
-                'anomalous': anomalous_events,
+                'normal': hour_counts.get('normal', 0),
+                'anomalous': hour_counts.get('anomalous', 0),
                 'count': total_events  # For backward compatibility
             })
 
-        return jsonify({
+        return make_json_response({
             'status_distribution': [{'status': status, 'count': count} for status, count in status_counts],
             'time_series': time_series
-        }), 200
+        })
     except Exception as e:
         print(f"Analytics error: {e}")
         return jsonify({'error': str(e)}), 500
@@ -699,7 +923,7 @@ def get_responses_analytics():
     """Get responses analytics for charts"""
     try:
         days = request.args.get('days', 7, type=int)
-        start_date = datetime.utcnow() - timedelta(days=days)
+        start_date = utc_now() - timedelta(days=days)
 
         # Responses by anomaly type
         type1_counts = db.session.query(
@@ -742,9 +966,18 @@ if __name__ == '__main__':
     # Create database tables
     with app.app_context():
         db.create_all()
+
+        # create_all skips existing tables, so add any missing indexes
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+
         print("Database initialized")
 
-    # Run the app
+    # Debug mode (and its reloader) only when explicitly requested
+    debug = os.environ.get('ANBD_DEBUG', '0') == '1'
+
+    # Run the app (served by eventlet's WSGI server in eventlet async mode)
     print("Starting ANBD Flask Backend...")
     print("WebSocket enabled for real-time updates")
-    socketio.run(app, host='127.0.0.1', port=5000, debug=True)
\ No newline at end of file
+    socketio.run(app, host='127.0.0.1', port=5000, debug=debug)
\ No newline at end of file
@@ -6,50 +6,124 @@ Dependencies: os, pathlib
 """
 
 import os
+import sys
+import functools
+import ipaddress
 from pathlib import Path
 from datetime import timedelta
+from types import MappingProxyType
+from typing import Any, Final, NamedTuple, Optional, Tuple
 
 # Base directory
 BASE_DIR = Path(__file__).parent.absolute()
 
+# Environment snapshot taken once at import; Config attributes resolve against it
+_ENV = os.environ.copy()
+
+def _env_str(name, default):
+    """Read a string setting, falling back to default when unset or empty"""
+    return _ENV.get(name) or default
+
+def _env_int(name, default):
+    """Read an integer setting, falling back to default when unset or empty"""
+    return int(_ENV.get(name) or default)
+
+def _env_float(name, default):
+    """Read a float setting, falling back to default when unset or empty"""
+    return float(_ENV.get(name) or default)
+
+def _build_ip_index(devices):
+    """Map every management/interface IP to its (device_name, device_config), first match wins"""
+    index = {}
+    for device_name, device_config in devices.items():
+        for ip in (device_config['management_ip'], *device_config['interfaces'].values()):
+            index.setdefault(ip, (device_name, device_config))
+    return index
+
+def _build_vlan_prefix_index(vlans):
+    """Longest-prefix-match table: ((netmask int, {network int: (vlan_name, vlan_config)}), ...) longest first"""
+    by_prefix = {}
+    for vlan_name, vlan_config in vlans.items():
+        network = ipaddress.IPv4Network(vlan_config['subnet'])
+        by_prefix.setdefault(network.prefixlen, {}).setdefault(
+            int(network.network_address), (vlan_name, vlan_config)
+        )
+    return tuple(
+        (int(ipaddress.IPv4Network(f'0.0.0.0/{prefixlen}').netmask), networks)
+        for prefixlen, networks in sorted(by_prefix.items(), reverse=True)
+    )
+
+def _resolve_playbooks(playbooks):
+    """Turn (possibly nested) relative playbook paths into absolute Paths under BASE_DIR"""
+    return {
+        name: _resolve_playbooks(value) if isinstance(value, dict) else BASE_DIR / value
+        for name, value in playbooks.items()
+    }
+
+def _iter_playbook_paths(playbooks):
+    """Yield every Path in a (possibly nested) playbook mapping"""
+    for value in playbooks.values():
+        if isinstance(value, dict):
+            yield from _iter_playbook_paths(value)
+        else:
+            yield value
+
+class Type1Thresholds(NamedTuple):
+    """Flat snapshot of RCA_TYPE1_THRESHOLDS for attribute access in the RCA scan"""
+    flow_bytes_per_sec: float
+    flow_packets_per_sec: float
+    total_fwd_packets: float
+    total_bwd_packets: float
+    fwd_header_length: float
+    bwd_header_length: float
+    max_packet_length: float
+    packet_length_mean: float
+    flow_duration: float
+
+    @classmethod
+    def from_config(cls, thresholds):
+        """Flatten the nested {anomaly_type: {name: value}} threshold dict"""
+        return cls(**{name: value for group in thresholds.values() for name, value in group.items()})
+
 class Config:
     """Base configuration class with secure defaults"""
 
     # Application Settings
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'anbd-dev-key-change-in-production'
+    SECRET_KEY = _env_str('SECRET_KEY', 'anbd-dev-key-change-in-production')
     DEBUG = False
     TESTING = False
 
     # Database Configuration
-    DATABASE_URL = os.environ.get('DATABASE_URL') or f'sqlite:///{BASE_DIR}/anbd.db'
+    DATABASE_URL = _env_str('DATABASE_URL', f'sqlite:///{BASE_DIR}/anbd.db')
     SQLALCHEMY_DATABASE_URI = DATABASE_URL  # Flask-SQLAlchemy requires this key
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
+    SQLALCHEMY_ENGINE_OPTIONS = MappingProxyType({
         'pool_timeout': 20,
         'pool_recycle': -1,
-        'pool_pre_ping': True
-    }
+        'pool_pre_ping': True,
+        'pool_use_lifo': True
+    })
 
     # WebSocket Configuration
-    WEBSOCKET_HOST = os.environ.get('WEBSOCKET_HOST') or 'localhost'
-    WEBSOCKET_PORT = int(os.environ.get('WEBSOCKET_PORT') or 5000)
+    WEBSOCKET_HOST = _env_str('WEBSOCKET_HOST', 'localhost')
+    WEBSOCKET_PORT = _env_int('WEBSOCKET_PORT', 5000)
     WEBSOCKET_CORS_ALLOWED_ORIGINS = ['http://localhost:*', 'https://localhost:*']
     WEBSOCKET_PING_TIMEOUT = 60
     WEBSOCKET_PING_INTERVAL = 25
 
     # Data Generation Settings
-    DATA_GENERATION_INTERVAL = int(os.environ.get('DATA_GENERATION_INTERVAL') or 120)  # 2 minutes
+    DATA_GENERATION_INTERVAL = _env_int('DATA_GENERATION_INTERVAL', 120)  # 2 minutes
     DATA_DIRECTORY = BASE_DIR / 'data' / 'network_data'
-    MAX_CSV_FILES = int(os.environ.get('MAX_CSV_FILES') or 100)
+    MAX_CSV_FILES = _env_int('MAX_CSV_FILES', 100)
 
     # ML Model Configuration
     MODEL_PATH = BASE_DIR / 'model' / 'lstm_vae_model.keras'
     SCALER_PATH = BASE_DIR / 'model' / 'scaler.pkl'
-    ANOMALY_THRESHOLD = float(os.environ.get('ANOMALY_THRESHOLD') or 0.5)
-    BATCH_SIZE = int(os.environ.get('BATCH_SIZE') or 32)
+    ANOMALY_THRESHOLD = _env_float('ANOMALY_THRESHOLD', 0.5)
+    BATCH_SIZE = _env_int('BATCH_SIZE', 32)
 
-    # Feature Configuration (35 features for model)
-    IMPORTANT_FEATURES = [
+    # Feature Configuration (35 features for model), frozen and interned
+    IMPORTANT_FEATURES = tuple(sys.intern(name) for name in [
         'Flow Duration', 'Total Fwd Packets', 'Total Backward Packets',
         'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
         'Fwd Packet Length Max', 'Fwd Packet Length Mean', 'Fwd Packet Length Std',
@@ -61,14 +135,16 @@ class Config:
         'ACK Flag Count', 'Down/Up Ratio', 'Average Packet Size',
         'Avg Bwd Segment Size', 'Subflow Fwd Bytes', 'Init_Win_bytes_forward',
         'Init_Win_bytes_backward', 'Idle Mean', 'Idle Max', 'Idle Min'
-    ]
+    ])
+    IMPORTANT_FEATURE_INDEX = {name: i for i, name in enumerate(IMPORTANT_FEATURES)}
 
     # RCA Type 1 Features (subset for rule-based analysis)
-    RCA_TYPE1_FEATURES = [
+    RCA_TYPE1_FEATURES = tuple(sys.intern(name) for name in [
         'Flow Duration', 'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
         'Flow Bytes/s', 'Flow Packets/s', 'Fwd Header Length', 'Bwd Header Length',
         'Max Packet Length', 'Packet Length Mean'
-    ]
+    ])
+    RCA_TYPE1_FEATURE_INDEX = {name: i for i, name in enumerate(RCA_TYPE1_FEATURES)}
 
     # RCA Configuration
     RCA_TYPE1_THRESHOLDS = {
@@ -92,9 +168,10 @@ class Config:
             'flow_duration': 300000000  # 5 minutes in microseconds
         }
     }
+    RCA_TYPE1 = Type1Thresholds.from_config(RCA_TYPE1_THRESHOLDS)
 
     # Network Device Configuration
-    NETWORK_DEVICES = {
+    NETWORK_DEVICES: Final[dict[str, dict[str, Any]]] = {
         'CORE-RO-1': {
             'type': 'cisco_router',
             'management_ip': '192.168.61.1',
@@ -153,7 +230,7 @@ class Config:
     }
 
     # VLAN Configuration
-    VLANS = {
+    VLANS: Final[dict[str, dict[str, Any]]] = {
         'VLAN10': {
             'subnet': '192.168.10.0/24',
             'gateway': '192.168.10.1',
@@ -184,6 +261,10 @@ class Config:
         }
     }
 
+    # Reverse lookup tables, built once at class creation
+    _IP_TO_DEVICE = _build_ip_index(NETWORK_DEVICES)
+    _VLAN_PREFIXES = _build_vlan_prefix_index(VLANS)
+
     # Playbook Configuration
     TROUBLESHOOT_PLAYBOOKS = {
         'high_latency': 'rca/troubleshoot_engine/playbooks/high_latency.yml',
@@ -210,8 +291,16 @@ class Config:
         }
     }
 
+    # Resolve playbook paths once and stat each file once at import
+    TROUBLESHOOT_PLAYBOOKS = _resolve_playbooks(TROUBLESHOOT_PLAYBOOKS)
+    RESPONSE_PLAYBOOKS = _resolve_playbooks(RESPONSE_PLAYBOOKS)
+    PLAYBOOK_EXISTS = {
+        path: path.is_file()
+        for path in (*_iter_playbook_paths(TROUBLESHOOT_PLAYBOOKS), *_iter_playbook_paths(RESPONSE_PLAYBOOKS))
+    }
+
     # Logging Configuration
-    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_LEVEL = _env_str('LOG_LEVEL', 'INFO')
     LOG_DIR = BASE_DIR / 'logs'
     LOG_FILES = {
         'app': LOG_DIR / 'app.log',
@@ -228,9 +317,9 @@ class Config:
     RATE_LIMIT_PER_MINUTE = 60
 
     # Processing Configuration
-    MAX_CONCURRENT_PROCESSES = int(os.environ.get('MAX_CONCURRENT_PROCESSES') or 4)
-    PROCESS_TIMEOUT = int(os.environ.get('PROCESS_TIMEOUT') or 300)  # 5 minutes
-    QUEUE_MAX_SIZE = int(os.environ.get('QUEUE_MAX_SIZE') or 1000)
+    MAX_CONCURRENT_PROCESSES = _env_int('MAX_CONCURRENT_PROCESSES', 4)
+    PROCESS_TIMEOUT = _env_int('PROCESS_TIMEOUT', 300)  # 5 minutes
+    QUEUE_MAX_SIZE = _env_int('QUEUE_MAX_SIZE', 1000)
 
     # Monitoring Configuration
     HEALTH_CHECK_INTERVAL = 30  # seconds
@@ -242,6 +331,17 @@ class Config:
         'error_rate_percent': 5
     }
 
+    def __init_subclass__(cls, **kwargs):
+        """Keep the flat threshold snapshot in sync with subclass overrides"""
+        super().__init_subclass__(**kwargs)
+        cls.RCA_TYPE1 = Type1Thresholds.from_config(cls.RCA_TYPE1_THRESHOLDS)
+
+    @classmethod
+    def reload_thresholds(cls):
+        """Re-snapshot RCA_TYPE1 after RCA_TYPE1_THRESHOLDS is changed at runtime"""
+        cls.RCA_TYPE1 = Type1Thresholds.from_config(cls.RCA_TYPE1_THRESHOLDS)
+        return cls.RCA_TYPE1
+
     @classmethod
     def init_app(cls, app):
         """Initialize application with configuration"""
@@ -253,28 +353,23 @@ class Config:
         cls.MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
 
     @classmethod
-    def get_device_by_ip(cls, ip_address):
+    def get_device_by_ip(cls, ip_address: str) -> Tuple[Optional[str], Optional[dict[str, Any]]]:
         """Get device configuration by IP address"""
-        for device_name, device_config in cls.NETWORK_DEVICES.items():
-            if device_config['management_ip'] == ip_address:
-                return device_name, device_config
-            for interface_ip in device_config['interfaces'].values():
-                if interface_ip == ip_address:
-                    return device_name, device_config
-        return None, None
+        return cls._IP_TO_DEVICE.get(ip_address, (None, None))
 
     @classmethod
-    def get_vlan_by_ip(cls, ip_address):
+    def get_vlan_by_ip(cls, ip_address: str) -> Tuple[Optional[str], Optional[dict[str, Any]]]:
         """Get VLAN configuration by IP address"""
-        import ipaddress
         try:
-            ip = ipaddress.ip_address(ip_address)
-            for vlan_name, vlan_config in cls.VLANS.items():
-                network = ipaddress.ip_network(vlan_config['subnet'])
-                if ip in network:
-                    return vlan_name, vlan_config
+            ip = int(ipaddress.IPv4Address(ip_address))
         except ValueError:
-            pass
+            return None, None
+
+        # One masked dict probe per distinct prefix length, most specific first
+        for netmask, networks in cls._VLAN_PREFIXES:
+            match = networks.get(ip & netmask)
+            if match:
+                return match
         return None, None
 
 class DevelopmentConfig(Config):
@@ -322,13 +417,14 @@ class ProductionConfig(Config):
     RATE_LIMIT_PER_MINUTE = 30
 
     # Performance optimizations
-    SQLALCHEMY_ENGINE_OPTIONS = {
+    SQLALCHEMY_ENGINE_OPTIONS = MappingProxyType({
         'pool_timeout': 30,
         'pool_recycle': 3600,
         'pool_pre_ping': True,
         'pool_size': 10,
-        'max_overflow': 20
-    }
+        'max_overflow': 20,
+        'pool_use_lifo': True
+    })
 
 class TestingConfig(Config):
     """Testing configuration"""
@@ -354,15 +450,22 @@ config = {
     'default': DevelopmentConfig
 }
 
+# Config classes that already passed validate_config in this process
+_VALIDATED = set()
+
+@functools.lru_cache(maxsize=None)
 def get_config(config_name=None):
-    """Get configuration class by name"""
+    """Get configuration class by name (memoized per name)"""
     if config_name is None:
         config_name = os.environ.get('FLASK_ENV', 'default')
 
     return config.get(config_name, config['default'])
 
 def validate_config(config_class):
-    """Validate configuration settings"""
+    """Validate configuration settings (once per class per process)"""
+    if config_class in _VALIDATED:
+        return True
+
     errors = []
 
     # Check required paths exist
@@ -384,4 +487,5 @@ def validate_config(config_class):
     if errors:
         raise ValueError(f"Configuration validation failed: {'; '.join(errors)}")
 
+    _VALIDATED.add(config_class)
     return True
\ No newline at end of file
@@ -6,36 +6,71 @@ Dependencies: SQLAlchemy, Flask-SQLAlchemy, config
 """
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import create_engine, event, text
+from sqlalchemy import create_engine, event, text, DateTime, make_url
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlalchemy.exc import SQLAlchemyError, DisconnectionError
 from contextlib import contextmanager
 import logging
+import sqlite3
+import orjson
+from utils.core import OrjsonCodec, TTLCache
 import threading
 from pathlib import Path
 
 # Global SQLAlchemy instance
 db = SQLAlchemy()
 
+class utcnow(FunctionElement):
+    """Server-side UTC 'now' for column defaults"""
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def _compile_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(utcnow, 'sqlite')
+def _compile_utcnow_sqlite(element, compiler, **kw):
+    # Same text layout SQLAlchemy binds for DateTime on SQLite (microseconds included),
+    # so database-stamped and Python-stamped values compare and sort consistently
+    return "(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"
+
+# Table row counts reported by get_database_stats, refreshed at most this often
+STATS_TTL_SECONDS = 10
+_table_counts = TTLCache(ttl=STATS_TTL_SECONDS, max_size=1)
+
 # Session factory
 Session = None
+# Context-scoped session used by the repositories; removed at app-context teardown
+SessionLocal = None
 engine = None
 logger = logging.getLogger(__name__)
 
+def _load_json_column(value):
+    """Decode a JSON column value; a malformed legacy value reads as NULL instead of failing the query"""
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        logger.warning(f"Ignoring malformed JSON column value: {value[:80]!r}")
+        return None
+
 class DatabaseManager:
     """Database connection and session management"""
 
     def __init__(self):
         self.engine = None
         self.Session = None
+        self.SessionLocal = None
         self.db = db
         self._lock = threading.Lock()
         self._initialized = False
 
     def init_app(self, app):
         """Initialize database with Flask app"""
-        global engine, Session
+        global engine, Session, SessionLocal
 
         with self._lock:
             if self._initialized:
@@ -46,37 +81,69 @@ class DatabaseManager:
                 # Configure SQLAlchemy
                 self.db.init_app(app)
 
-                # Create engine with connection pooling
-                engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+                # Create engine with connection pooling; copy so the config's
+                # (possibly read-only, class-level) mapping is never mutated
+                engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
 
-                # Add security and performance settings
+                # Add security and performance settings; sized so a burst of socket
+                # events (each holding a session) does not exhaust the pool
                 engine_options.update({
                     'poolclass': QueuePool,
-                    'pool_size': engine_options.get('pool_size', 5),
-                    'max_overflow': engine_options.get('max_overflow', 10),
-                    'pool_timeout': engine_options.get('pool_timeout', 30),
-                    'pool_recycle': engine_options.get('pool_recycle', 3600),
+                    'pool_size': engine_options.get('pool_size', 20),
+                    'max_overflow': engine_options.get('max_overflow', 20),
+                    'pool_timeout': engine_options.get('pool_timeout', 10),
+                    'pool_recycle': engine_options.get('pool_recycle', 1800),
                     'pool_pre_ping': engine_options.get('pool_pre_ping', True),
+                    'pool_use_lifo': engine_options.get('pool_use_lifo', True),
+                    # Room for every distinct statement the app compiles (the default is 500)
+                    'query_cache_size': engine_options.get('query_cache_size', 1200),
+                    'json_serializer': OrjsonCodec.dumps,
+                    'json_deserializer': _load_json_column,
                     'echo': False  # Disable SQL echo to reduce logging
                 })
 
+                # An in-memory SQLite database exists per connection, so every
+                # thread must share one connection rather than draw from a pool
+                url = make_url(app.config['DATABASE_URL'])
+                if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+                    for key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_use_lifo'):
+                        engine_options.pop(key)
+                    engine_options['poolclass'] = StaticPool
+                    engine_options['connect_args'] = {
+                        **engine_options.get('connect_args', {}),
+                        'check_same_thread': False
+                    }
+
+                # psycopg2: send bulk event inserts as multi-row VALUES pages, and
+                # batch executemany UPDATEs, instead of one round trip per row
+                if url.get_backend_name() == 'postgresql' and url.get_driver_name() == 'psycopg2':
+                    engine_options.setdefault('executemany_mode', 'values_plus_batch')
+
                 self.engine = create_engine(
                     app.config['DATABASE_URL'],
                     **engine_options
                 )
 
-                # Create session factory
-                self.Session = scoped_session(
-                    sessionmaker(
-                        bind=self.engine,
-                        autocommit=False,
-                        autoflush=False
-                    )
+                # Create session factory; callers own and close each session, so
+                # there is no thread-local registry to maintain
+                self.Session = sessionmaker(
+                    bind=self.engine,
+                    autocommit=False,
+                    autoflush=False
                 )
 
+                # Repository session: one per thread/greenlet, reused across calls in a
+                # request or socket event and removed when its app context ends
+                self.SessionLocal = scoped_session(sessionmaker(
+                    bind=self.engine,
+                    autoflush=False,
+                    expire_on_commit=False
+                ))
+
                 # Set global references
                 engine = self.engine
                 Session = self.Session
+                SessionLocal = self.SessionLocal
 
                 # Set up event listeners
                 self._setup_event_listeners()
@@ -92,9 +159,17 @@ class DatabaseManager:
                     # Create all tables
                     self.db.create_all()
 
+                    # create_all skips existing tables, so add any missing indexes
+                    for table in self.db.metadata.sorted_tables:
+                        for index in table.indexes:
+                            index.create(bind=self.db.engine, checkfirst=True)
+
                     # Verify database connection
                     self._verify_connection()
 
+                # Open the pool's base connections now rather than on first request
+                self._warm_pool()
+
                 self._initialized = True
                 logger.info("Database initialized successfully")
 
@@ -102,6 +177,14 @@ class DatabaseManager:
                 logger.error(f"Failed to initialize database: {str(e)}")
                 raise
 
+    def _warm_pool(self):
+        """Check out and return pool_size connections so they are opened up front"""
+        if not isinstance(self.engine.pool, QueuePool):
+            return
+        connections = [self.engine.connect() for _ in range(self.engine.pool.size())]
+        for connection in connections:
+            connection.close()
+
     def _ensure_database_directory(self, database_url):
         """Ensure database directory exists for SQLite"""
         if database_url.startswith('sqlite:///'):
@@ -115,27 +198,45 @@ class DatabaseManager:
 
     def _setup_event_listeners(self):
         """Set up SQLAlchemy event listeners for monitoring"""
+        is_sqlite = 'sqlite' in str(self.engine.url)
+        is_memory = is_sqlite and self.engine.url.database in (None, '', ':memory:')
+
+        # Enable foreign keys and tune SQLite for a write-heavy workload; built once
+        # and run as a single script per new connection
+        pragmas = ["PRAGMA foreign_keys=ON;"]
+        if not is_memory:
+            # WAL lets readers run alongside the writer; NORMAL skips the per-commit fsync
+            pragmas += ["PRAGMA journal_mode=WAL;", "PRAGMA synchronous=NORMAL;"]
+        pragmas += [
+            "PRAGMA temp_store=MEMORY;",
+            "PRAGMA mmap_size=268435456;",  # 256MB
+            "PRAGMA cache_size=-65536;",  # 64MB
+            "PRAGMA busy_timeout=5000;",
+        ]
+        pragma_script = "\n".join(pragmas)
 
         @event.listens_for(self.engine, "connect")
         def receive_connect(dbapi_connection, connection_record):
             """Handle new database connections"""
-            logger.debug("New database connection established")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("New database connection established")
 
-            # Enable foreign keys for SQLite
-            if 'sqlite' in str(self.engine.url):
+            if is_sqlite:
                 cursor = dbapi_connection.cursor()
-                cursor.execute("PRAGMA foreign_keys=ON")
+                cursor.executescript(pragma_script)
                 cursor.close()
 
         @event.listens_for(self.engine, "checkout")
         def receive_checkout(dbapi_connection, connection_record, connection_proxy):
             """Handle connection checkout from pool"""
-            logger.debug("Database connection checked out from pool")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Database connection checked out from pool")
 
         @event.listens_for(self.engine, "checkin")
         def receive_checkin(dbapi_connection, connection_record):
             """Handle connection checkin to pool"""
-            logger.debug("Database connection checked in to pool")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Database connection checked in to pool")
 
         @event.listens_for(self.engine, "invalidate")
         def receive_invalidate(dbapi_connection, connection_record, exception):
@@ -161,16 +262,20 @@ class DatabaseManager:
 
         return self.Session()
 
+    def get_scoped_session(self):
+        """Get the current context's repository session"""
+        if not self._initialized or not self.SessionLocal:
+            raise RuntimeError("Database not initialized")
+
+        return self.SessionLocal()
+
     def remove_session(self):
-        """Remove current session"""
-        if self.Session:
-            self.Session.remove()
+        """Close and discard the current context's repository session"""
+        if self.SessionLocal:
+            self.SessionLocal.remove()
 
     def close_all_sessions(self):
-        """Close all database sessions"""
-        if self.Session:
-            self.Session.remove()
-
+        """Close all pooled database connections"""
         if self.engine:
             self.engine.dispose()
 
@@ -179,14 +284,20 @@ class DatabaseManager:
         if not self.engine:
             return None
 
-        return {
+        pool = self.engine.pool
+        info = {
             'url': str(self.engine.url),
             'driver': self.engine.driver,
-            'pool_size': self.engine.pool.size(),
-            'checked_out': self.engine.pool.checkedout(),
-            'overflow': self.engine.pool.overflow(),
-            'checked_in': self.engine.pool.checkedin()
+            'pool_status': pool.status()
         }
+        if isinstance(pool, QueuePool):
+            info.update({
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'checked_in': pool.checkedin()
+            })
+        return info
 
 # Global database manager instance
 db_manager = DatabaseManager()
@@ -200,6 +311,10 @@ def get_db_session():
     """Get a new database session"""
     return db_manager.get_session()
 
+def get_scoped_session():
+    """Get the repository session for the current request/socket event"""
+    return db_manager.get_scoped_session()
+
 def close_db_session(session=None):
     """Close database session"""
     if session:
@@ -210,6 +325,22 @@ def close_db_session(session=None):
     else:
         db_manager.remove_session()
 
+@contextmanager
+def session_scope(commit=False):
+    """Yield the current request/socket event's session; commit if asked, roll back on error
+
+    The session is not closed here: it is shared by everything else in the same
+    context and removed at app-context teardown.
+    """
+    session = get_scoped_session()
+    try:
+        yield session
+        if commit:
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
 @contextmanager
 def get_db_transaction():
     """Context manager for database transactions"""
@@ -224,8 +355,30 @@ def get_db_transaction():
     finally:
         close_db_session(session)
 
-def execute_query(query, params=None, fetch_all=False):
-    """Execute a raw SQL query safely"""
+def execute_read(query, params=None, fetch_all=False):
+    """Execute a read-only SQL query on a pooled connection without a transaction"""
+    if not db_manager.engine:
+        raise RuntimeError("Database not initialized")
+
+    try:
+        with db_manager.engine.connect() as conn:
+            conn.execution_options(isolation_level='AUTOCOMMIT')
+            result = conn.execute(text(query), params or {})
+
+            if fetch_all:
+                return result.fetchall()
+            else:
+                return result.fetchone()
+
+    except SQLAlchemyError as e:
+        logger.error(f"Read query execution failed: {str(e)}")
+        raise
+
+def execute_query(query, params=None, fetch_all=False, read_only=False):
+    """Execute a raw SQL query safely (read_only=True skips the transaction)"""
+    if read_only:
+        return execute_read(query, params, fetch_all)
+
     with get_db_transaction() as session:
         try:
             if params:
@@ -245,8 +398,7 @@ def execute_query(query, params=None, fetch_all=False):
 def check_database_health():
     """Check database health and connectivity"""
     try:
-        with get_db_transaction() as session:
-            session.execute(text('SELECT 1'))
+        execute_read('SELECT 1')
 
         engine_info = db_manager.get_engine_info()
 
@@ -264,26 +416,29 @@ def check_database_health():
             'connection_test': 'failed'
         }
 
-def get_database_stats():
-    """Get database statistics"""
+def _count_tables():
+    """Row counts of the events and responses tables (0 for a missing table)"""
+    counts = {}
+
+    # Events table count
     try:
-        stats = {}
+        counts['events_count'] = execute_read('SELECT COUNT(*) FROM events')[0]
+    except:
+        counts['events_count'] = 0
 
-        # Get table row counts
-        with get_db_transaction() as session:
-            # Events table count
-            try:
-                result = session.execute(text('SELECT COUNT(*) FROM events'))
-                stats['events_count'] = result.scalar()
-            except:
-                stats['events_count'] = 0
+    # Responses table count
+    try:
+        counts['responses_count'] = execute_read('SELECT COUNT(*) FROM responses')[0]
+    except:
+        counts['responses_count'] = 0
 
-            # Responses table count
-            try:
-                result = session.execute(text('SELECT COUNT(*) FROM responses'))
-                stats['responses_count'] = result.scalar()
-            except:
-                stats['responses_count'] = 0
+    return counts
+
+def get_database_stats():
+    """Get database statistics"""
+    try:
+        # Table counts are full scans; engine statistics below stay live
+        stats = dict(_table_counts.get_or_set('counts', _count_tables))
 
         # Engine statistics
         engine_info = db_manager.get_engine_info()
@@ -314,23 +469,35 @@ def reset_database():
         logger.error(f"Database reset failed: {str(e)}")
         return False
 
+BACKUP_PAGES_PER_STEP = 1024
+
+def _log_backup_progress(status, remaining, total):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Backup progress: {total - remaining}/{total} pages")
+
 def backup_database(backup_path):
-    """Create database backup (SQLite only)"""
+    """Create database backup (SQLite only) with the online backup API"""
     try:
         if not str(engine.url).startswith('sqlite'):
             raise ValueError("Backup only supported for SQLite databases")
 
-        import shutil
-
         # Get database file path
-        db_path = str(engine.url).replace('sqlite:///', '')
+        db_path = engine.url.database
         backup_path = Path(backup_path)
 
         # Create backup directory
         backup_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Copy database file
-        shutil.copy2(db_path, backup_path)
+        # Copy page by page; consistent under WAL without blocking writers
+        src = sqlite3.connect(db_path)
+        try:
+            dst = sqlite3.connect(str(backup_path))
+            try:
+                src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=_log_backup_progress)
+            finally:
+                dst.close()
+        finally:
+            src.close()
 
         logger.info(f"Database backup created: {backup_path}")
         return True
@@ -2,7 +2,23 @@
 """
 Database Models Package
 """
-from .events import Event
-from .response import Response
+import importlib
 
-__all__ = ['Event', 'Response']
\ No newline at end of file
+# Models are imported on first attribute access (PEP 562) so importing one
+# model does not construct the others
+_MODEL_MODULES = {
+    'Event': '.events',
+    'Response': '.response'
+}
+
+__all__ = ['Event', 'Response']
+
+
+def __getattr__(name):
+    module_name = _MODEL_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # cache so later lookups skip __getattr__
+    return value
\ No newline at end of file
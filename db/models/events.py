@@ -4,44 +4,71 @@ Purpose: SQLAlchemy model for network events
 Dependencies: SQLAlchemy, database.py
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
-from db.database import db
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, desc
+from db.database import db, utcnow
+import operator
+import orjson
+
+# Serialized columns in to_dict order, fetched in one C-level call
+_EVENT_ATTRS = operator.attrgetter(
+    'id', 'log_id', 'timestamp', 'src_ip', 'dst_ip', 'src_port', 'dst_port', 'is_anomalous'
+)
 
 class Event(db.Model):
     """Network events table"""
     __tablename__ = 'events'
+    __table_args__ = (
+        # Anomaly timeline, newest first: WHERE is_anomalous = ? ORDER BY timestamp DESC
+        Index('ix_events_anom_ts', 'is_anomalous', desc('timestamp')),
+        # Flow lookups by endpoint pair; also covers src_ip-only predicates and the
+        # GROUP BY src_ip top-talkers count without touching the table
+        Index('ix_events_src_dst', 'src_ip', 'dst_ip'),
+    )
+    # Fetch server-generated timestamps in the INSERT itself rather than on next access
+    __mapper_args__ = {'eager_defaults': True}
 
     # Primary key
     id = Column(Integer, primary_key=True)
 
     # Event identification
-    log_id = Column(String(50), unique=True, nullable=False, index=True)
+    log_id = Column(String(32), unique=True, nullable=False, index=True)  # 'log_YYYYmmdd_HHMMSS_xxxxxxxx'
 
-    # Timestamp
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Timestamp (filled in by the database, so bulk inserts can omit it)
+    timestamp = Column(DateTime, server_default=utcnow(), nullable=False, index=True)
 
     # Network metadata
-    src_ip = Column(String(45), nullable=False, index=True)  # IPv4/IPv6
-    dst_ip = Column(String(45), nullable=False, index=True)
+    src_ip = Column(String(45), nullable=False)  # IPv4/IPv6
+    dst_ip = Column(String(45), nullable=False)
     src_port = Column(Integer)
     dst_port = Column(Integer)
 
     # Anomaly status
-    is_anomalous = Column(Boolean, default=False, index=True)
+    is_anomalous = Column(Boolean, default=False)
 
     def __repr__(self):
         return f'<Event {self.log_id}: {self.src_ip}->{self.dst_ip}>'
 
+    @classmethod
+    def bulk_insert(cls, session, rows):
+        """Insert many event rows (dicts) with one Core executemany, no ORM instances;
+        rows without a timestamp get the database's CURRENT_TIMESTAMP"""
+        if rows:
+            session.execute(cls.__table__.insert(), rows)
+
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
+        event_id, log_id, timestamp, src_ip, dst_ip, src_port, dst_port, is_anomalous = _EVENT_ATTRS(self)
         return {
-            'id': self.id,
-            'log_id': self.log_id,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'src_ip': self.src_ip,
-            'dst_ip': self.dst_ip,
-            'src_port': self.src_port,
-            'dst_port': self.dst_port,
-            'is_anomalous': self.is_anomalous
-        }
\ No newline at end of file
+            'id': event_id,
+            'log_id': log_id,
+            'timestamp': timestamp and timestamp.isoformat(),
+            'src_ip': src_ip,
+            'dst_ip': dst_ip,
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'is_anomalous': is_anomalous
+        }
+
+    def to_json_bytes(self):
+        """Serialize straight to JSON bytes for WebSocket sends"""
+        return orjson.dumps(self.to_dict())
\ No newline at end of file
@@ -4,21 +4,28 @@ Purpose: SQLAlchemy model for response actions
 Dependencies: SQLAlchemy, database.py
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, JSON
+from sqlalchemy.orm import relationship, foreign
 from db.database import db
+from db.models.events import Event
 from datetime import datetime
-import json
 
 class Response(db.Model):
     """Response actions table"""
     __tablename__ = 'responses'
+    __table_args__ = (
+        # Filtered response lists: WHERE <filter column> ... ORDER BY timestamp
+        Index('ix_resp_success_ts', 'success', 'timestamp'),
+        Index('ix_resp_type1_ts', 'anomaly_type1', 'timestamp'),
+        Index('ix_resp_type2_ts', 'anomaly_type2', 'timestamp'),
+    )
 
     # Primary key
     id = Column(Integer, primary_key=True)
 
-    # Reference IDs
-    log_id = Column(String(50), nullable=False, index=True)
-    anomaly_id = Column(String(50), nullable=False, index=True)
+    # Reference IDs ('log_YYYYmmdd_HHMMSS_xxxxxxxx' / 'anomaly_YYYYmmdd_HHMMSS_xxxxxxxx')
+    log_id = Column(String(32), nullable=False, index=True)
+    anomaly_id = Column(String(32), unique=True, nullable=False, index=True)  # one response per anomaly
 
     # Timestamp
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -31,7 +38,7 @@ class Response(db.Model):
 
     # RCA Type 1 (Rule-based)
     anomaly_type1 = Column(String(100))
-    re_features = Column(Text)  # JSON string
+    re_features = Column(JSON)  # decoded to a dict by the column type
     res_type1 = Column(String(100))
 
     # RCA Type 2 (Network troubleshooting)
@@ -42,20 +49,18 @@ class Response(db.Model):
     success = Column(Boolean, default=False)
     duration_ms = Column(Integer)  # Execution time in milliseconds
 
+    # Originating event, joined on log_id (no FK). lazy='raise' makes accidental
+    # per-row loads fail loudly; load it for a whole page with selectinload
+    event = relationship(
+        Event,
+        primaryjoin=lambda: foreign(Response.log_id) == Event.log_id,
+        viewonly=True,
+        lazy='raise'
+    )
+
     def __repr__(self):
         return f'<Response {self.anomaly_id}: {self.anomaly_type1}/{self.anomaly_type2}>'
 
-    def set_features(self, features_dict):
-        """Set reFeatures as JSON string"""
-        self.re_features = json.dumps(features_dict) if features_dict else None
-
-    def get_features(self):
-        """Get reFeatures as dictionary"""
-        try:
-            return json.loads(self.re_features) if self.re_features else {}
-        except:
-            return {}
-
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
         return {
@@ -68,7 +73,7 @@ class Response(db.Model):
             'src_port': self.src_port,
             'dst_port': self.dst_port,
             'anomaly_type1': self.anomaly_type1,
-            're_features': self.get_features(),
+            're_features': self.re_features or {},
             'res_type1': self.res_type1,
             'anomaly_type2': self.anomaly_type2,
             'res_type2': self.res_type2,
@@ -4,7 +4,31 @@ Purpose: Common CRUD operations for all models
 Dependencies: SQLAlchemy, database
 """
 
-from db.database import get_db_session, close_db_session
+from db.database import session_scope
+from utils.core import TTLCache
+from sqlalchemy import tuple_
+from contextlib import contextmanager
+from datetime import datetime
+import base64
+import json
+
+# How long whole-table rollups (counts, rates, averages) are served from memory
+ROLLUP_TTL_SECONDS = 5
+
+
+def encode_cursor(timestamp, record_id):
+    """Encode the last row's (timestamp, id) as an opaque page cursor"""
+    payload = json.dumps({'ts': timestamp.isoformat(), 'id': record_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a page cursor back to (timestamp, id)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload['ts']), int(payload['id'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {cursor!r}") from e
 
 
 class BaseRepository:
@@ -12,65 +36,101 @@ class BaseRepository:
 
     def __init__(self, model_class):
         self.model_class = model_class
+        self._rollups = TTLCache(ttl=ROLLUP_TTL_SECONDS, max_size=32)
+
+    @contextmanager
+    def _scope(self, commit=False):
+        """Yield the context's shared session; commit writes, roll back on error
+
+        The session is not closed here: it is reused by later calls in the same
+        request or socket event and removed at app-context teardown.
+        """
+        with session_scope(commit) as session:
+            yield session
+        if commit:
+            # Writes make cached rollups stale
+            self._rollups.clear()
 
     def create(self, **kwargs):
         """Create new record"""
-        session = get_db_session()
-        try:
+        with self._scope(commit=True) as session:
             instance = self.model_class(**kwargs)
             session.add(instance)
-            session.commit()
-            return instance
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            close_db_session(session)
+        return instance
+
+    def _cached_rollup(self, key, compute):
+        """Serve a whole-table aggregate from the TTL cache, computing it on a miss"""
+        return self._rollups.get_or_set(key, compute)
+
+    def _keyset_page(self, query, cursor=None, per_page=20, include_total=False, filters=None,
+                     page=1, as_mappings=False):
+        """Fetch one page newest-first, seeking past the cursor instead of using OFFSET
+
+        Returns (rows, page_info); one extra row is fetched to tell whether a next
+        page exists, so no COUNT is needed unless include_total is set. Totals are
+        served from the rollup cache per distinct filter set. Without a cursor,
+        page > 1 falls back to OFFSET for clients that still page by number.
+        as_mappings executes a column query's statement directly and returns
+        dict-like RowMappings (which must include timestamp and id).
+        """
+        # Zero or negative sizes would break the cursor or (LIMIT -N) return every row
+        per_page = max(1, min(per_page, 100))
+        model = self.model_class
+        total = None
+        if include_total:
+            total_key = ('page_total', tuple(sorted((filters or {}).items())))
+            total = self._cached_rollup(total_key, query.count)
+
+        query = query.order_by(model.timestamp.desc(), model.id.desc())
+        if cursor:
+            cursor_ts, cursor_id = decode_cursor(cursor)
+            query = query.filter(tuple_(model.timestamp, model.id) < tuple_(cursor_ts, cursor_id))
+        elif page > 1:
+            query = query.offset((page - 1) * per_page)
+
+        query = query.limit(per_page + 1)
+        if as_mappings:
+            rows = query.session.execute(query.statement).mappings().all()
+        else:
+            rows = query.all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+
+        next_cursor = None
+        if has_next:
+            last = rows[-1]
+            next_cursor = (encode_cursor(last['timestamp'], last['id']) if as_mappings
+                           else encode_cursor(last.timestamp, last.id))
+
+        return rows, {
+            'per_page': per_page,
+            'has_next': has_next,
+            'next_cursor': next_cursor,
+            'total': total
+        }
 
     def get_by_id(self, record_id):
-        """Get record by ID"""
-        session = get_db_session()
-        try:
-            return session.query(self.model_class).filter(
-                self.model_class.id == record_id
-            ).first()
-        finally:
-            close_db_session(session)
+        """Get record by ID (identity map first, then a primary-key lookup)"""
+        with self._scope() as session:
+            return session.get(self.model_class, record_id)
 
     def get_all(self, limit=100):
         """Get all records with limit"""
-        session = get_db_session()
-        try:
+        with self._scope() as session:
             return session.query(self.model_class).limit(limit).all()
-        finally:
-            close_db_session(session)
 
     def update(self, record_id, **kwargs):
         """Update record"""
-        session = get_db_session()
-        try:
+        with self._scope(commit=True) as session:
             session.query(self.model_class).filter(
                 self.model_class.id == record_id
             ).update(kwargs)
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            close_db_session(session)
+        return True
 
     def delete(self, record_id):
         """Delete record"""
-        session = get_db_session()
-        try:
+        with self._scope(commit=True) as session:
             session.query(self.model_class).filter(
                 self.model_class.id == record_id
             ).delete()
-            session.commit()
-            return True
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            close_db_session(session)
\ No newline at end of file
+        return True
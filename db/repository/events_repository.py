@@ -6,7 +6,19 @@ Dependencies: base_repository, events model
 
 from db.repository.base_repository import BaseRepository
 from db.models.events import Event
-from db.database import get_db_session, close_db_session
+from sqlalchemy import bindparam, case, func, lambda_stmt, select
+from datetime import datetime, timedelta
+
+# Hot single-row lookup: built once and cached by lambda identity
+_STMT_GET_BY_LOG = lambda_stmt(
+    lambda: select(Event).where(Event.log_id == bindparam('log_id')).limit(1)
+)
+
+# Columns of Event.to_dict, for read-only listings that skip ORM hydration
+_EVENT_COLUMNS = (
+    Event.id, Event.log_id, Event.timestamp, Event.src_ip, Event.dst_ip,
+    Event.src_port, Event.dst_port, Event.is_anomalous
+)
 
 
 class EventsRepository(BaseRepository):
@@ -17,17 +29,20 @@ class EventsRepository(BaseRepository):
 
     def get_by_log_id(self, log_id):
         """Get event by log ID"""
-        session = get_db_session()
-        try:
-            return session.query(Event).filter(Event.log_id == log_id).first()
-        finally:
-            close_db_session(session)
-
-    def get_paginated(self, page=1, per_page=20, filters=None):
-        """Get paginated events with filters"""
-        session = get_db_session()
-        try:
-            query = session.query(Event)
+        with self._scope() as session:
+            return session.execute(
+                _STMT_GET_BY_LOG, {'log_id': log_id}
+            ).scalar_one_or_none()
+
+    def get_paginated(self, cursor=None, per_page=20, filters=None, include_total=False,
+                      page=1, as_rows=False):
+        """Get a page of events (newest first) after the given cursor, with filters
+
+        as_rows returns dict-like column mappings (the to_dict fields) instead of
+        Event objects, skipping ORM hydration.
+        """
+        with self._scope() as session:
+            query = session.query(*_EVENT_COLUMNS) if as_rows else session.query(Event)
 
             # Apply filters
             if filters:
@@ -43,39 +58,52 @@ class EventsRepository(BaseRepository):
                         (Event.dst_ip.contains(ip_filter))
                     )
 
-            total = query.count()
-            offset = (page - 1) * per_page
-            events = query.order_by(Event.timestamp.desc()).offset(offset).limit(per_page).all()
-
-            return {
-                'events': events,
-                'total': total,
-                'page': page,
-                'per_page': per_page
-            }
-        finally:
-            close_db_session(session)
-
-    def get_recent_events(self, hours=1):
-        """Get recent events within specified hours"""
-        from datetime import datetime, timedelta
-
-        session = get_db_session()
-        try:
+            events, page_info = self._keyset_page(
+                query, cursor, per_page, include_total, filters, page, as_mappings=as_rows
+            )
+            return {'events': events, **page_info}
+
+    def get_recent_events(self, hours=1, limit=1000):
+        """Get up to `limit` events from the last `hours` hours, newest first
+
+        Rows are streamed from the cursor in chunks of 200 as the result is
+        iterated, rather than materialized in one list.
+        """
+        with self._scope() as session:
             cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-            return session.query(Event).filter(
-                Event.timestamp >= cutoff_time
-            ).order_by(Event.timestamp.desc()).all()
-        finally:
-            close_db_session(session)
+            return session.execute(
+                select(Event)
+                .where(Event.timestamp >= cutoff_time)
+                .order_by(Event.timestamp.desc())
+                .limit(limit)
+                .execution_options(yield_per=200)
+            ).scalars()
+
+    def create_many(self, rows):
+        """Insert many events (list of column dicts) in a single transaction"""
+        with self._scope(commit=True) as session:
+            Event.bulk_insert(session, rows)
+        return len(rows)
 
     def count_anomalies(self):
-        """Count total anomalous events"""
-        session = get_db_session()
-        try:
+        """Count total anomalous events (cached briefly)"""
+        return self._cached_rollup('count_anomalies', self._count_anomalies)
+
+    def _count_anomalies(self):
+        with self._scope() as session:
             return session.query(Event).filter(Event.is_anomalous == True).count()
-        finally:
-            close_db_session(session)
+
+    def count_totals(self):
+        """Count all events and anomalous events in a single scan (cached briefly)"""
+        return self._cached_rollup('count_totals', self._count_totals)
+
+    def _count_totals(self):
+        with self._scope() as session:
+            row = session.query(
+                func.count(Event.id).label('total'),
+                func.sum(case((Event.is_anomalous == True, 1), else_=0)).label('anomalous')
+            ).one()
+            return {'total': row.total, 'anomalous': row.anomalous or 0}
 
 
 # Global instance
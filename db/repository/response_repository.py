@@ -6,7 +6,33 @@ Dependencies: base_repository, response model
 
 from db.repository.base_repository import BaseRepository
 from db.models.response import Response
-from db.database import get_db_session, close_db_session
+from db.models.events import Event
+from sqlalchemy.orm import selectinload
+from sqlalchemy import bindparam, case, func, insert, lambda_stmt, select
+
+# Hot single-row lookups: built once and cached by lambda identity, so each call
+# skips statement construction and cache-key generation
+_STMT_GET_BY_ANOMALY = lambda_stmt(
+    lambda: select(Response).where(Response.anomaly_id == bindparam('anomaly_id')).limit(1)
+)
+_STMT_GET_BY_LOG = lambda_stmt(
+    lambda: select(Response).where(Response.log_id == bindparam('log_id')).limit(1)
+)
+
+# Batch insert behind create_many, used by trigger_response1_batch for each chunk's
+# Type 1 responses: one multi-row INSERT ... RETURNING per 500 rows
+# (insertmanyvalues), ids returned in input order; compiled once
+_INSERT_RESPONSES = insert(Response).returning(
+    Response.id, sort_by_parameter_order=True
+).execution_options(insertmanyvalues_page_size=500)
+
+# Columns of Response.to_dict, for read-only listings that skip ORM hydration
+_RESPONSE_COLUMNS = (
+    Response.id, Response.log_id, Response.anomaly_id, Response.timestamp,
+    Response.src_ip, Response.dst_ip, Response.src_port, Response.dst_port,
+    Response.anomaly_type1, Response.re_features, Response.res_type1,
+    Response.anomaly_type2, Response.res_type2, Response.success, Response.duration_ms
+)
 
 
 class ResponseRepository(BaseRepository):
@@ -17,25 +43,39 @@ class ResponseRepository(BaseRepository):
 
     def get_by_anomaly_id(self, anomaly_id):
         """Get response by anomaly ID"""
-        session = get_db_session()
-        try:
-            return session.query(Response).filter(Response.anomaly_id == anomaly_id).first()
-        finally:
-            close_db_session(session)
+        with self._scope() as session:
+            return session.execute(
+                _STMT_GET_BY_ANOMALY, {'anomaly_id': anomaly_id}
+            ).scalar_one_or_none()
 
     def get_by_log_id(self, log_id):
         """Get response by log ID"""
-        session = get_db_session()
-        try:
-            return session.query(Response).filter(Response.log_id == log_id).first()
-        finally:
-            close_db_session(session)
-
-    def get_paginated(self, page=1, per_page=20, filters=None):
-        """Get paginated responses with filters"""
-        session = get_db_session()
-        try:
-            query = session.query(Response)
+        with self._scope() as session:
+            return session.execute(
+                _STMT_GET_BY_LOG, {'log_id': log_id}
+            ).scalar_one_or_none()
+
+    def create_many(self, rows):
+        """Insert many responses (list of column dicts) in one transaction; returns their ids"""
+        if not rows:
+            return []
+        with self._scope(commit=True) as session:
+            return session.scalars(_INSERT_RESPONSES, rows).all()
+
+    def get_paginated(self, cursor=None, per_page=20, filters=None, include_total=False,
+                      include_event=False, page=1, as_rows=False):
+        """Get a page of responses (newest first) after the given cursor, with filters
+
+        include_event loads each response's originating event in one extra IN query.
+        as_rows returns dict-like column mappings (the to_dict fields) instead of
+        Response objects, skipping ORM hydration, and ignores include_event.
+        """
+        with self._scope() as session:
+            query = session.query(*_RESPONSE_COLUMNS) if as_rows else session.query(Response)
+            if include_event and not as_rows:
+                query = query.options(
+                    selectinload(Response.event).load_only(Event.src_ip, Event.dst_ip, Event.timestamp)
+                )
 
             # Apply filters
             if filters:
@@ -49,43 +89,35 @@ class ResponseRepository(BaseRepository):
                 elif filters.get('status') == 'failed':
                     query = query.filter(Response.success == False)
 
-            total = query.count()
-            offset = (page - 1) * per_page
-            responses = query.order_by(Response.timestamp.desc()).offset(offset).limit(per_page).all()
-
-            return {
-                'responses': responses,
-                'total': total,
-                'page': page,
-                'per_page': per_page
-            }
-        finally:
-            close_db_session(session)
+            responses, page_info = self._keyset_page(
+                query, cursor, per_page, include_total, filters, page, as_mappings=as_rows
+            )
+            return {'responses': responses, **page_info}
 
     def get_success_rate(self):
-        """Get overall success rate"""
-        session = get_db_session()
-        try:
-            total = session.query(Response).count()
-            successful = session.query(Response).filter(Response.success == True).count()
+        """Get overall success rate (one conditional-aggregate scan, cached briefly)"""
+        return self._cached_rollup('success_rate', self._success_rate)
+
+    def _success_rate(self):
+        with self._scope() as session:
+            row = session.query(
+                func.count(Response.id).label('total'),
+                func.sum(case((Response.success == True, 1), else_=0)).label('ok')
+            ).one()
 
-            if total == 0:
+            if not row.total:
                 return 0.0
 
-            return (successful / total) * 100
-        finally:
-            close_db_session(session)
+            return (row.ok / row.total) * 100
 
     def get_average_duration(self):
-        """Get average response duration"""
-        from sqlalchemy import func
+        """Get average response duration (cached briefly)"""
+        return self._cached_rollup('average_duration', self._average_duration)
 
-        session = get_db_session()
-        try:
+    def _average_duration(self):
+        with self._scope() as session:
             avg_duration = session.query(func.avg(Response.duration_ms)).scalar()
             return avg_duration or 0.0
-        finally:
-            close_db_session(session)
 
 
 # Global instance
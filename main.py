@@ -5,6 +5,10 @@ Security: CORS configuration, error handling, input validation
 Dependencies: Flask, Flask-SocketIO, config, routes, db
 """
 
+# Patch the stdlib before anything else imports socket/threading/time
+import eventlet
+eventlet.monkey_patch()
+
 import os
 import sys
 from pathlib import Path
@@ -15,15 +19,16 @@ sys.path.insert(0, str(Path(__file__).parent))
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO, emit, disconnect
 from flask_cors import CORS
+from flask_compress import Compress
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import threading
 import signal
 import atexit
 
 from config import get_config, validate_config
-from db.database import init_db, get_db_session, close_db_session
-from utils.core import setup_logger, StateManager
+from db.database import init_db, get_db_session, get_scoped_session, close_db_session, db_manager
+from utils.core import setup_logger, StateManager, OrjsonCodec, register_update_sender
 from utils.error_handler import handle_exceptions
 from utils.data_generator import DataGenerator
 
@@ -33,6 +38,67 @@ state_manager = None
 data_generator = None
 logger = None
 
+# Current UTC time as ISO text, refreshed a few times a second by a background
+# task so socket emits do not each build a datetime and format it
+NOW_ISO_REFRESH_SECONDS = 0.25
+_NOW_ISO = [datetime.utcnow().isoformat()]
+
+# How often the dashboard metrics are recomputed and broadcast to every client
+STATUS_BROADCAST_SECONDS = 5
+
+def _snapshot_metrics(session):
+    """Compute all dashboard metrics in one round trip (scalar subqueries, no cross join)"""
+    from sqlalchemy import select, func, case
+    from db.models.events import Event
+    from db.models.response import Response
+
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    hour_ago = now - timedelta(hours=1)
+
+    def event_count(*criteria):
+        return select(func.count(Event.id)).where(*criteria).scalar_subquery()
+
+    row = session.execute(select(
+        event_count().label('total_events'),
+        event_count(Event.timestamp >= today).label('events_today'),
+        event_count(Event.is_anomalous == True).label('total_anomalies'),
+        event_count(Event.is_anomalous == True, Event.timestamp >= hour_ago).label('anomalies_hour'),
+        select(func.count(Response.id)).scalar_subquery().label('total_responses'),
+        select(func.sum(case((Response.success == True, 1), else_=0))).scalar_subquery().label('successful')
+    )).one()
+
+    return {
+        'totalEvents': row.total_events,
+        'eventsToday': row.events_today,
+        'totalAnomalies': row.total_anomalies,
+        'anomaliesHour': row.anomalies_hour,
+        'totalResponses': row.total_responses,
+        'successRate': round((row.successful or 0) / row.total_responses * 100, 1) if row.total_responses else 0
+    }
+
+def _broadcast_status():
+    """Refresh the metrics snapshot and broadcast it to all clients, once per interval"""
+    while True:
+        socketio.sleep(STATUS_BROADCAST_SECONDS)
+        session = get_db_session()
+        try:
+            metrics = _snapshot_metrics(session)
+        except Exception as e:
+            logger.error(f"Error computing status metrics: {str(e)}")
+            continue
+        finally:
+            close_db_session(session)
+
+        state_manager.set_metrics(metrics)
+        socketio.emit('status_update', metrics)
+
+def _refresh_now_iso():
+    """Keep _NOW_ISO current for the lifetime of the server"""
+    while True:
+        _NOW_ISO[0] = datetime.utcnow().isoformat()
+        socketio.sleep(NOW_ISO_REFRESH_SECONDS)
+
 def create_app(config_name=None):
     """
     Application factory pattern for Flask app creation
@@ -56,25 +122,47 @@ def create_app(config_name=None):
     # Initialize database
     init_db(app)
 
+    @app.teardown_appcontext
+    def remove_db_session(exception=None):
+        """Discard the repository session bound to this request/socket event"""
+        close_db_session()
+
     # Initialize state manager
     state_manager = StateManager()
 
     # Configure CORS
     CORS(app, origins=["http://localhost:*", "https://localhost:*"])
 
+    # Gzip JSON/HTML responses for clients that accept it (before routes are registered)
+    Compress(app)
+
     # Initialize SocketIO with security settings
     socketio = SocketIO(
         app,
         cors_allowed_origins=["*"],  # Allow all origins for now
-        logger=True,  # Enable SocketIO logging for debugging
-        engineio_logger=True,
-        async_mode='threading',  # Use threading mode for better compatibility
+        # Packet logging stringifies every emit, so only enable it while debugging
+        logger=app.debug,
+        engineio_logger=app.debug,
+        # Green threads serve many clients cheaply; threading keeps the debugger/reloader usable
+        async_mode='threading' if app.debug else 'eventlet',
         transports=['websocket', 'polling'],  # Add this line
         allow_upgrades=True,  # Add this line
         ping_timeout=60,
-        ping_interval=25
+        ping_interval=25,
+        json=OrjsonCodec,  # orjson encodes/decodes every packet
+        # Compress long-polling payloads over 1KB; the eventlet websocket transport
+        # negotiates permessage-deflate with clients that offer it
+        http_compression=True,
+        compression_threshold=1024
     )
 
+    # Start the shared emit timestamp clock and the periodic status broadcast
+    socketio.start_background_task(_refresh_now_iso)
+    socketio.start_background_task(_broadcast_status)
+
+    # Let background routes (preprocessing, prediction, responses) emit updates
+    register_update_sender(send_real_time_update)
+
     # Register routes
     register_routes(app)
 
@@ -108,19 +196,18 @@ def register_routes(app):
         def health_check():
             """Application health check endpoint"""
             try:
-                # Check database connection
+                # Check database connection (request session, removed at teardown)
                 from sqlalchemy import text
-                session = get_db_session()
-                session.execute(text('SELECT 1'))
-                close_db_session(session)
+                get_scoped_session().execute(text('SELECT 1'))
 
                 # Check state manager
                 status = state_manager.get_status() if state_manager else 'unknown'
 
                 return jsonify({
                     'status': 'healthy',
-                    'timestamp': datetime.utcnow().isoformat(),
+                    'timestamp': _NOW_ISO[0],
                     'monitoring_status': status,
+                    'database_pool': db_manager.get_engine_info(),
                     'version': '1.0.0'
                 }), 200
 
@@ -129,7 +216,7 @@ def register_routes(app):
                 return jsonify({
                     'status': 'unhealthy',
                     'error': str(e),
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _NOW_ISO[0]
                 }), 503
 
         # Root endpoint
@@ -173,7 +260,7 @@ def register_websocket_events():
         emit('connection_status', {
             'status': 'connected',
             'client_id': client_id,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _NOW_ISO[0]
         })
 
         # Send current monitoring status
@@ -181,24 +268,18 @@ def register_websocket_events():
             status = state_manager.get_status()
             emit('monitoring_status', {
                 'status': status,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': _NOW_ISO[0]
             })
 
-        # Send initial system status
-        emit('status_update', {
-            'totalEvents': 0,
-            'eventsToday': 0,
-            'totalAnomalies': 0,
-            'anomaliesHour': 0,
-            'totalResponses': 0,
-            'successRate': 0
-        })
+        # Send the last broadcast metrics snapshot rather than querying per connect
+        emit('status_update', state_manager.get_metrics())
 
     @socketio.on('disconnect')
     def handle_disconnect():
         """Handle client disconnection"""
         client_id = request.sid
         logger.info(f"Client disconnected: {client_id}")
+        close_db_session()
 
     @socketio.on('start_monitoring')
     @handle_exceptions(logger)
@@ -211,7 +292,7 @@ def register_websocket_events():
             if state_manager.is_monitoring():
                 emit('error', {
                     'message': 'Monitoring already active',
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _NOW_ISO[0]
                 })
                 return
 
@@ -224,21 +305,21 @@ def register_websocket_events():
                 # Notify all clients
                 socketio.emit('monitoring_started', {
                     'status': 'started',
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _NOW_ISO[0]
                 })
 
                 logger.info("Monitoring started successfully")
             else:
                 emit('error', {
                     'message': 'Failed to start monitoring',
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _NOW_ISO[0]
                 })
 
         except Exception as e:
             logger.error(f"Error starting monitoring: {str(e)}")
             emit('error', {
                 'message': f'Start monitoring failed: {str(e)}',
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': _NOW_ISO[0]
             })
 
     @socketio.on('stop_monitoring')
@@ -252,7 +333,7 @@ def register_websocket_events():
             if not state_manager.is_monitoring():
                 emit('error', {
                     'message': 'Monitoring not active',
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _NOW_ISO[0]
                 })
                 return
 
@@ -265,21 +346,21 @@ def register_websocket_events():
                 # Notify all clients
                 socketio.emit('monitoring_stopped', {
                     'status': 'stopped',
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _NOW_ISO[0]
                 })
 
                 logger.info("Monitoring stopped successfully")
             else:
                 emit('error', {
                     'message': 'Failed to stop monitoring',
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _NOW_ISO[0]
                 })
 
         except Exception as e:
             logger.error(f"Error stopping monitoring: {str(e)}")
             emit('error', {
                 'message': f'Stop monitoring failed: {str(e)}',
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': _NOW_ISO[0]
             })
 
     @socketio.on('get_events')
@@ -290,10 +371,11 @@ def register_websocket_events():
             from routes.api import get_paginated_events
 
             page = data.get('page', 1)
-            per_page = min(data.get('perPage', 20), 100)  # Max 100 items
+            per_page = max(1, min(data.get('perPage', 20), 100))  # 1-100 items
             filters = data.get('filters', {})
+            cursor = data.get('cursor')
 
-            events_data = get_paginated_events(page, per_page, filters)
+            events_data = get_paginated_events(page, per_page, filters, cursor)
 
             emit('events_data', events_data)
 
@@ -301,7 +383,7 @@ def register_websocket_events():
             logger.error(f"Error getting events: {str(e)}")
             emit('error', {
                 'message': f'Failed to get events: {str(e)}',
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': _NOW_ISO[0]
             })
 
     @socketio.on('get_responses')
@@ -312,10 +394,11 @@ def register_websocket_events():
             from routes.api import get_paginated_responses
 
             page = data.get('page', 1)
-            per_page = min(data.get('perPage', 20), 100)  # Max 100 items
+            per_page = max(1, min(data.get('perPage', 20), 100))  # 1-100 items
             filters = data.get('filters', {})
+            cursor = data.get('cursor')
 
-            responses_data = get_paginated_responses(page, per_page, filters)
+            responses_data = get_paginated_responses(page, per_page, filters, cursor)
 
             emit('responses_data', responses_data)
 
@@ -323,14 +406,14 @@ def register_websocket_events():
             logger.error(f"Error getting responses: {str(e)}")
             emit('error', {
                 'message': f'Failed to get responses: {str(e)}',
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': _NOW_ISO[0]
             })
 
     @socketio.on('heartbeat')
     def handle_heartbeat():
         """Handle client heartbeat"""
         emit('heartbeat_ack', {
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _NOW_ISO[0]
         })
 
     logger.info("WebSocket events registered successfully")
@@ -390,7 +473,7 @@ def register_error_handlers(app):
             'message': 'The request was malformed or invalid',
             'path': request.path,
             'method': request.method,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _NOW_ISO[0]
         }), 400
 
     @app.errorhandler(404)
@@ -398,7 +481,7 @@ def register_error_handlers(app):
         return jsonify({
             'error': 'Not Found',
             'message': 'The requested resource was not found',
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _NOW_ISO[0]
         }), 404
 
     @app.errorhandler(500)
@@ -407,7 +490,7 @@ def register_error_handlers(app):
         return jsonify({
             'error': 'Internal Server Error',
             'message': 'An unexpected error occurred',
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _NOW_ISO[0]
         }), 500
 
     @app.errorhandler(Exception)
@@ -416,7 +499,7 @@ def register_error_handlers(app):
         return jsonify({
             'error': 'Server Error',
             'message': 'An error occurred while processing your request',
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _NOW_ISO[0]
         }), 500
 
     logger.info("Error handlers registered successfully")
@@ -452,7 +535,7 @@ def initialize_services(app):
         def on_new_data(data):
             if socketio:
                 socketio.emit('new_data_generated', {
-                    'timestamp': datetime.utcnow().isoformat(),
+                    'timestamp': _NOW_ISO[0],
                     'filename': data.get('filename', ''),
                     'row_count': data.get('row_count', 0)
                 })
@@ -487,8 +570,9 @@ def register_shutdown_handlers(app):
             if data_generator:
                 data_generator.stop()
 
-            # Close database sessions
+            # Close database sessions and drop pooled connections
             close_db_session()
+            db_manager.close_all_sessions()
 
             logger.info("Application shutdown completed")
 
@@ -513,7 +597,7 @@ def send_real_time_update(event_type, data):
     if socketio:
         socketio.emit(event_type, {
             **data,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _NOW_ISO[0]
         })
 
 # Application factory
@@ -1,22 +1,93 @@
 """
 Module: Simple ML Model Handler
 Purpose: Load LSTM-VAE model and make predictions
-Dependencies: tensorflow, sklearn, pandas, numpy
+Dependencies: tensorflow, sklearn, numpy
 """
 
 import tensorflow as tf
 from tensorflow import keras
 import numpy as np
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.impute import KNNImputer
-from scipy.stats.mstats import winsorize
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, MinMaxScaler
 import joblib
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Per-feature training medians, saved next to the scaler; used to fill missing values
+FEATURE_MEDIANS_FILE = 'feature_medians.npy'
+
+# Fitted preprocessing pipeline (winsorize -> impute -> scale), saved next to the
+# scaler as one artifact; see build_preprocess_pipeline
+PIPELINE_FILE = 'preprocess_pipeline.joblib'
+
+# Upper bound on requests scored in one forward pass
+MAX_INFERENCE_BATCH = 32
+
+# Per-feature training 1st/99th percentiles, shape (2, 35), saved next to the scaler
+FEATURE_BOUNDS_FILE = 'feature_bounds.npy'
+
+# Model input features, in training order
+_REQUIRED_FEATURES = (
+    'Flow Duration', 'Total Fwd Packets', 'Total Backward Packets',
+    'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
+    'Fwd Packet Length Max', 'Fwd Packet Length Mean', 'Fwd Packet Length Std',
+    'Bwd Packet Length Max', 'Bwd Packet Length Mean', 'Bwd Packet Length Std',
+    'Flow Bytes/s', 'Flow Packets/s', 'Flow IAT Mean', 'Flow IAT Std',
+    'Flow IAT Max', 'Flow IAT Min', 'Fwd IAT Total', 'Fwd Header Length',
+    'Bwd Header Length', 'Min Packet Length', 'Max Packet Length',
+    'Packet Length Mean', 'Packet Length Std', 'Packet Length Variance',
+    'ACK Flag Count', 'Down/Up Ratio', 'Average Packet Size',
+    'Avg Bwd Segment Size', 'Subflow Fwd Bytes', 'Init_Win_bytes_forward',
+    'Init_Win_bytes_backward', 'Idle Mean', 'Idle Max', 'Idle Min'
+)
+
+def _prep(vec, lo, hi, scale, offset, fill):
+    """Fill non-finite values, cap to [lo, hi] and apply MinMax scaling, in place on vec"""
+    np.copyto(vec, fill, where=~np.isfinite(vec))
+    np.clip(vec, lo, hi, out=vec)
+    np.multiply(vec, scale, out=vec)
+    np.add(vec, offset, out=vec)
+    return vec
+
+def build_preprocess_pipeline(X, limits=(0.01, 0.01)):
+    """Fit the training preprocessing on X (n_samples, 35) as one Pipeline
+
+    Winsorizes at the given lower/upper quantiles, imputes missing values with the
+    per-feature median and min-max scales. Save the result with joblib as
+    PIPELINE_FILE next to the scaler so load_model picks it up.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    X = np.where(np.isfinite(X), X, np.nan)
+    lo, hi = np.nanquantile(X, [limits[0], 1.0 - limits[1]], axis=0)
+    return Pipeline([
+        ('winsor', FunctionTransformer(np.clip, kw_args={'a_min': lo, 'a_max': hi})),
+        ('imputer', SimpleImputer(strategy='median')),
+        ('scaler', MinMaxScaler())
+    ]).fit(X)
+
+def _not_loaded_result():
+    """Safe non-anomalous prediction returned while no model is loaded"""
+    return {
+        'is_anomalous': False,
+        'reconstruction_error': 0.0,
+        'confidence': 0.0,
+        'note': 'Model not loaded'
+    }
+
+def _to_float(value):
+    """Coerce a raw feature value to float, NaN when it is not numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
 # Custom sampling function (must match training)
 @tf.keras.utils.register_keras_serializable()
 def sampling(args):
@@ -33,6 +104,51 @@ def custom_vae_loss(y_true, y_pred):
     reconstruction_loss = tf.reduce_mean(tf.reduce_sum(tf.square(y_true - y_pred), axis=(1, 2)))
     return reconstruction_loss
 
+class InferenceBatcher:
+    """Coalesces concurrent single-sample predictions into one batched forward pass
+
+    Callers submit a preprocessed feature vector and wait on the returned Future.
+    A worker thread takes the first queued vector, keeps draining until the batch is
+    full or batch_timeout seconds have passed, then scores the whole batch at once.
+    """
+
+    def __init__(self, score_batch, max_batch_size=32, batch_timeout=0.002):
+        self._score_batch = score_batch
+        self._max_batch_size = max_batch_size
+        self._batch_timeout = batch_timeout
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='anbd-inference', daemon=True)
+        self._thread.start()
+
+    def submit(self, vector):
+        """Queue one feature vector; the Future resolves to its reconstruction error"""
+        future = Future()
+        self._queue.put((vector, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._batch_timeout
+            while len(batch) < self._max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                errors = self._score_batch(np.stack([vector for vector, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), error in zip(batch, errors):
+                future.set_result(float(error))
+
 class ANBDModel:
     """LSTM-VAE model for anomaly detection"""
 
@@ -42,6 +158,19 @@ class ANBDModel:
         self.seq_len = 10  # From training code
         self.input_dim = 35  # 35 features from config
         self.threshold = 0.5  # Default threshold
+        self.feature_fill = np.zeros(self.input_dim, dtype=np.float32)  # Missing-value fill, per feature
+        self.feature_lo = np.full(self.input_dim, -np.inf, dtype=np.float32)  # Winsorization bounds
+        self.feature_hi = np.full(self.input_dim, np.inf, dtype=np.float32)
+        self._summary = None  # Keras layer summary, captured at load
+        self.pipeline = None  # Fitted winsorize/impute/scale pipeline, when shipped
+        self._scale = None  # MinMax scale_/min_ as float32, when the scaler is fitted
+        self._offset = None
+        self.interpreter = None  # TFLite interpreter when conversion succeeds
+        self._predict_fn = None  # Traced Keras forward pass (fallback path)
+        self._interpreter_batch = 1  # Batch size the interpreter is currently sized for
+        self._batcher = None  # Cross-request batching in front of the model
+        self._input_buf = None  # Reused (batch, seq_len, input_dim) model input
+        self._interpreter_lock = threading.Lock()  # an interpreter is not thread-safe
         self.is_loaded = False
 
         if model_path:
@@ -59,6 +188,56 @@ class ANBDModel:
                 }
             )
 
+            # Layer summary text, rendered once for get_model_info
+            summary_lines = []
+            self.model.summary(print_fn=summary_lines.append)
+            self._summary = '\n'.join(summary_lines)
+
+            # Preprocessing parameters: the fitted pipeline artifact if shipped,
+            # otherwise the separate scaler/medians/bounds files
+            self._load_preprocessing(scaler_path)
+
+            # Graph-mode forward pass with a fixed signature: traced once, no Keras
+            # predict() scaffolding per call
+            self._predict_fn = tf.function(
+                lambda x: self.model(x, training=False),
+                input_signature=[tf.TensorSpec((None, self.seq_len, self.input_dim), tf.float32)]
+            )
+
+            # Serve inference from a float16-quantized TFLite copy when possible
+            try:
+                self._build_interpreter()
+                logger.info("Model converted to TFLite (float16) for inference")
+            except Exception as e:
+                self.interpreter = None
+                logger.warning(f"TFLite conversion failed, using Keras for inference: {str(e)}")
+
+            self._batcher = InferenceBatcher(self._score_batch, max_batch_size=MAX_INFERENCE_BATCH)
+            self._input_buf = np.empty((MAX_INFERENCE_BATCH, self.seq_len, self.input_dim), dtype=np.float32)
+
+            # Pay graph tracing / kernel selection now rather than on the first request
+            warmup_start = time.perf_counter()
+            self._score_batch(np.zeros((1, self.input_dim), dtype=np.float32))
+            logger.info(f"Model warm-up took {(time.perf_counter() - warmup_start) * 1000:.1f} ms")
+
+            self.is_loaded = True
+            logger.info("Model and scaler loaded successfully")
+
+        except Exception as e:
+            logger.error(f"Failed to load model: {str(e)}")
+            raise
+
+    def _load_preprocessing(self, scaler_path=None):
+        """Load winsorize/impute/scale parameters next to scaler_path"""
+        pipeline_path = Path(scaler_path).with_name(PIPELINE_FILE) if scaler_path else None
+        if pipeline_path and pipeline_path.exists():
+            self.pipeline = joblib.load(pipeline_path)
+            winsor = self.pipeline.named_steps['winsor'].kw_args
+            self.feature_lo = np.asarray(winsor['a_min'], dtype=np.float32)
+            self.feature_hi = np.asarray(winsor['a_max'], dtype=np.float32)
+            self.feature_fill = self.pipeline.named_steps['imputer'].statistics_.astype(np.float32)
+            self.scaler = self.pipeline.named_steps['scaler']
+        else:
             # Load scaler if available
             if scaler_path and Path(scaler_path).exists():
                 self.scaler = joblib.load(scaler_path)
@@ -67,71 +246,101 @@ class ANBDModel:
                 self.scaler = MinMaxScaler()
                 logger.warning("Scaler not found, using default MinMaxScaler")
 
-            self.is_loaded = True
-            logger.info("Model and scaler loaded successfully")
+            # Load missing-value fill (training medians) if available, else zeros
+            medians_path = Path(scaler_path).with_name(FEATURE_MEDIANS_FILE) if scaler_path else None
+            if medians_path and medians_path.exists():
+                self.feature_fill = np.load(medians_path).astype(np.float32).reshape(self.input_dim)
+            else:
+                logger.warning("Feature medians not found, filling missing values with zeros")
 
-        except Exception as e:
-            logger.error(f"Failed to load model: {str(e)}")
-            raise
+            # Load winsorization bounds (training 1st/99th percentiles) if available
+            bounds_path = Path(scaler_path).with_name(FEATURE_BOUNDS_FILE) if scaler_path else None
+            if bounds_path and bounds_path.exists():
+                bounds = np.load(bounds_path).astype(np.float32).reshape(2, self.input_dim)
+                self.feature_lo, self.feature_hi = bounds[0], bounds[1]
+            else:
+                logger.warning("Feature bounds not found, values will not be capped")
+
+        # MinMax parameters as float32 vectors, so scaling is a single fused pass
+        if hasattr(self.scaler, 'scale_') and hasattr(self.scaler, 'min_'):
+            self._scale = np.asarray(self.scaler.scale_, dtype=np.float32)
+            self._offset = np.asarray(self.scaler.min_, dtype=np.float32)
+
+    def _build_interpreter(self):
+        """Convert the loaded Keras model to a float16-quantized TFLite interpreter"""
+        converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+        # LSTM and the VAE sampling op may need TF kernels beyond the builtin set
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS,
+            tf.lite.OpsSet.SELECT_TF_OPS
+        ]
+
+        interpreter = tf.lite.Interpreter(model_content=converter.convert())
+        input_index = interpreter.get_input_details()[0]['index']
+        interpreter.resize_tensor_input(input_index, [1, self.seq_len, self.input_dim])
+        interpreter.allocate_tensors()
+
+        self.interpreter = interpreter
+        self._input_index = input_index
+        self._output_index = interpreter.get_output_details()[0]['index']
+
+    def _reconstruct(self, input_data):
+        """Run the autoencoder on a (batch, seq_len, input_dim) array"""
+        if self.interpreter is None:
+            return self._predict_fn(tf.convert_to_tensor(input_data, dtype=tf.float32)).numpy()
+
+        with self._interpreter_lock:
+            batch_size = input_data.shape[0]
+            if batch_size != self._interpreter_batch:
+                self.interpreter.resize_tensor_input(
+                    self._input_index, [batch_size, self.seq_len, self.input_dim]
+                )
+                self.interpreter.allocate_tensors()
+                self._interpreter_batch = batch_size
+            self.interpreter.set_tensor(self._input_index, input_data.astype(np.float32, copy=False))
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output_index)
+
+    def _score_batch(self, vectors):
+        """Reconstruction error per row for a (batch, input_dim) array of preprocessed vectors"""
+        # Each sample is repeated along the sequence axis, as in training; written by
+        # broadcast into the preallocated input buffer (only the batcher thread uses it)
+        input_data = self._input_buf[:len(vectors)]
+        input_data[:] = vectors[:, np.newaxis, :]
+        reconstruction = self._reconstruct(input_data)
+        # Every timestep of the input is the same row, so compare against the row itself
+        return np.mean(np.square(reconstruction - vectors[:, np.newaxis, :]), axis=(1, 2))
+
+    def _transform(self, x):
+        """Fill, cap and scale a float32 feature vector (35,) or matrix (N, 35) in place"""
+        # Fused pass using the parameters extracted at load time
+        if self._scale is not None:
+            return _prep(x, self.feature_lo, self.feature_hi,
+                         self._scale, self._offset, self.feature_fill)
+
+        # Scaler without MinMax parameters: fill and cap here, let it transform
+        np.copyto(x, self.feature_fill, where=~np.isfinite(x))
+        np.clip(x, self.feature_lo, self.feature_hi, out=x)
+        rows = x.reshape(-1, self.input_dim)
+        if self.scaler:
+            return self.scaler.transform(rows).reshape(x.shape)
+
+        # Fallback: simple min-max scaling
+        return MinMaxScaler().fit_transform(rows).reshape(x.shape)
 
     def preprocess_features(self, features_dict):
         """Preprocess features using the same pipeline as training"""
         try:
-            # Convert to DataFrame
-            df = pd.DataFrame([features_dict])
-
-            # Ensure we have all 35 features
-            required_features = [
-                'Flow Duration', 'Total Fwd Packets', 'Total Backward Packets',
-                'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
-                'Fwd Packet Length Max', 'Fwd Packet Length Mean', 'Fwd Packet Length Std',
-                'Bwd Packet Length Max', 'Bwd Packet Length Mean', 'Bwd Packet Length Std',
-                'Flow Bytes/s', 'Flow Packets/s', 'Flow IAT Mean', 'Flow IAT Std',
-                'Flow IAT Max', 'Flow IAT Min', 'Fwd IAT Total', 'Fwd Header Length',
-                'Bwd Header Length', 'Min Packet Length', 'Max Packet Length',
-                'Packet Length Mean', 'Packet Length Std', 'Packet Length Variance',
-                'ACK Flag Count', 'Down/Up Ratio', 'Average Packet Size',
-                'Avg Bwd Segment Size', 'Subflow Fwd Bytes', 'Init_Win_bytes_forward',
-                'Init_Win_bytes_backward', 'Idle Mean', 'Idle Max', 'Idle Min'
-            ]
-
-            # Add missing features with default values
-            for feature in required_features:
-                if feature not in df.columns:
-                    df[feature] = 0.0
-
-            # Select only required features in correct order
-            df = df[required_features]
-
-            # Convert to numeric
-            df = df.apply(pd.to_numeric, errors='coerce')
-
-            # Replace infinities with NaN
-            df.replace([np.inf, -np.inf], np.nan, inplace=True)
-
-            # Winsorization (cap extreme values)
-            for col in df.columns:
-                df[col] = winsorize(df[col], limits=[0.01, 0.01])
-
-            # Handle missing values
-            imputer = KNNImputer(n_neighbors=5)
-            df_imputed = pd.DataFrame(imputer.fit_transform(df), columns=df.columns)
-
-            # Scale features
-            if self.scaler:
-                df_scaled = pd.DataFrame(
-                    self.scaler.transform(df_imputed),
-                    columns=df_imputed.columns
-                )
-            else:
-                # Fallback: simple min-max scaling
-                scaler = MinMaxScaler()
-                df_scaled = pd.DataFrame(
-                    scaler.fit_transform(df_imputed),
-                    columns=df_imputed.columns
-                )
+            # Fixed-order feature vector; missing features default to 0.0 and
+            # non-numeric values become NaN
+            x = np.fromiter(
+                (_to_float(features_dict.get(feature, 0.0)) for feature in _REQUIRED_FEATURES),
+                dtype=np.float32, count=len(_REQUIRED_FEATURES)
+            )
 
-            return df_scaled.values[0]  # Return first (and only) row
+            return self._transform(x)
 
         except Exception as e:
             logger.error(f"Error preprocessing features: {str(e)}")
@@ -141,22 +350,15 @@ class ANBDModel:
     def predict_anomaly(self, features_dict):
         """Predict if network traffic is anomalous"""
         if not self.is_loaded:
-            raise RuntimeError("Model not loaded")
+            # Checked before any preprocessing work
+            return _not_loaded_result()
 
         try:
             # Preprocess features
             preprocessed_features = self.preprocess_features(features_dict)
 
-            # Reshape for model input (batch_size=1, seq_len, input_dim)
-            # Repeat the single sample to create sequence
-            input_data = np.tile(preprocessed_features, (self.seq_len, 1))
-            input_data = input_data.reshape(1, self.seq_len, self.input_dim)
-
-            # Get reconstruction from model
-            reconstruction = self.model.predict(input_data, verbose=0)
-
-            # Calculate reconstruction error
-            mse = np.mean(np.square(input_data - reconstruction))
+            # Reconstruction error, scored together with any concurrent requests
+            mse = self._batcher.submit(preprocessed_features).result()
 
             # Determine if anomalous based on threshold
             is_anomalous = mse > self.threshold
@@ -176,6 +378,44 @@ class ANBDModel:
                 'error': str(e)
             }
 
+    def predict_batch(self, feature_matrix):
+        """Predict many flows at once from an (N, 35) matrix in _REQUIRED_FEATURES order
+
+        Returns one predict_anomaly-style result per row.
+        """
+        n_rows = len(feature_matrix)
+        if not self.is_loaded:
+            return [_not_loaded_result() for _ in range(n_rows)]
+
+        try:
+            try:
+                preprocessed = self._transform(np.array(feature_matrix, dtype=np.float32))
+            except Exception as e:
+                logger.error(f"Error preprocessing features: {str(e)}")
+                # Zero rows as fallback, as preprocess_features does for one flow
+                preprocessed = np.zeros((n_rows, self.input_dim), dtype=np.float32)
+
+            # Queue every row at once; the batcher scores them in full batches
+            futures = [self._batcher.submit(row) for row in preprocessed]
+            errors = np.array([future.result() for future in futures])
+
+            confidence = np.minimum(errors / self.threshold, 2.0)
+            return [
+                {
+                    'is_anomalous': bool(mse > self.threshold),
+                    'reconstruction_error': float(mse),
+                    'confidence': float(conf)
+                }
+                for mse, conf in zip(errors, confidence)
+            ]
+
+        except Exception as e:
+            logger.error(f"Error during batch prediction: {str(e)}")
+            return [
+                {'is_anomalous': False, 'reconstruction_error': 0.0, 'confidence': 0.0, 'error': str(e)}
+                for _ in range(n_rows)
+            ]
+
     def set_threshold(self, threshold):
         """Set anomaly detection threshold"""
         self.threshold = max(0.01, float(threshold))  # Minimum threshold of 0.01
@@ -188,9 +428,9 @@ class ANBDModel:
 
         return {
             'status': 'loaded',
-            'input_shape': (self.seq_len, self.input_dim),
+            'input_shape': [self.seq_len, self.input_dim],
             'threshold': self.threshold,
-            'model_summary': str(self.model.summary()) if self.model else None
+            'model_summary': self._summary
         }
 
 # Global model instance
@@ -227,15 +467,18 @@ def predict_anomaly(features_dict):
     if model_instance is None or not model_instance.is_loaded:
         # Return safe default when model not loaded
         logger.warning("Model not loaded - returning default non-anomalous result")
-        return {
-            'is_anomalous': False,
-            'reconstruction_error': 0.0,
-            'confidence': 0.0,
-            'note': 'Model not loaded'
-        }
+        return _not_loaded_result()
 
     return model_instance.predict_anomaly(features_dict)
 
+def predict_anomaly_batch(feature_matrix):
+    """Predict anomalies for an (N, 35) feature matrix using global model instance"""
+    if model_instance is None or not model_instance.is_loaded:
+        logger.warning("Model not loaded - returning default non-anomalous results")
+        return [_not_loaded_result() for _ in range(len(feature_matrix))]
+
+    return model_instance.predict_batch(feature_matrix)
+
 def get_model_status():
     """Get status of global model"""
     if model_instance is None:
@@ -4,61 +4,83 @@ Purpose: Basic CRUD endpoints for frontend
 Dependencies: Flask, db models, utils
 """
 
-from flask import Blueprint, jsonify, request
-from db.database import get_db_session, close_db_session
+from flask import Blueprint, current_app, jsonify, request
+from db.database import session_scope
 from db.models.events import Event
 from db.models.response import Response
-from utils.core import sanitize_string, safe_int
+from db.repository import events_repo, response_repo
+from utils.core import sanitize_string, safe_int, short_cache, TTLCache
+from sqlalchemy import case, func, select
+from datetime import datetime, timedelta
+import orjson
 import logging
 
 logger = logging.getLogger(__name__)
 api_bp = Blueprint('api', __name__)
 
+# Dashboard status counts are polled often; serve them from memory for a few seconds
+AGGREGATE_TTL_SECONDS = 5
+_aggregates = TTLCache(ttl=AGGREGATE_TTL_SECONDS, max_size=8)
+
+# /metrics analytics include a whole-table GROUP BY (top talkers) that changes slowly
+METRICS_TTL_SECONDS = 10
+_metrics_cache = TTLCache(ttl=METRICS_TTL_SECONDS, max_size=1)
+
+
+def _json_response(payload, status=200):
+    """Serialize payload with orjson (datetimes encode as ISO 8601, like to_dict)"""
+    return current_app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
+
+
+def _event_rows(rows):
+    """Event column mappings to dicts with the to_dict keys"""
+    return [dict(row) for row in rows]
+
+
+def _response_rows(rows):
+    """Response column mappings to dicts with the to_dict keys"""
+    return [{**row, 're_features': row['re_features'] or {}} for row in rows]
+
+
+def _page_info(page, per_page, page_data):
+    """Pagination block for a repository page: keyset cursor plus the cached total"""
+    total = page_data['total'] or 0
+    return {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'has_next': page_data['has_next'],
+        'next_cursor': page_data['next_cursor']
+    }
+
 
 @api_bp.route('/events')
 def get_events():
-    """Get events with pagination and filters"""
+    """Get events with pagination and filters
+
+    Pass the returned next_cursor as ?cursor= to fetch the next page with an
+    index seek; ?page= is still accepted for the first request or old clients.
+    """
     try:
         page = safe_int(request.args.get('page', 1), 1)
-        per_page = min(safe_int(request.args.get('per_page', 20), 20), 100)
+        per_page = max(1, min(safe_int(request.args.get('per_page', 20), 20), 100))
+        cursor = request.args.get('cursor') or None
         event_type = sanitize_string(request.args.get('type', 'all'))
         ip_filter = sanitize_string(request.args.get('ip', ''))
 
-        session = get_db_session()
-        query = session.query(Event)
-
-        # Apply filters
-        if event_type == 'anomalous':
-            query = query.filter(Event.is_anomalous == True)
-        elif event_type == 'normal':
-            query = query.filter(Event.is_anomalous == False)
+        page_data = events_repo.get_paginated(
+            cursor=cursor, per_page=per_page, filters={'type': event_type, 'ip': ip_filter},
+            include_total=True, page=page, as_rows=True
+        )
 
-        if ip_filter:
-            query = query.filter(
-                (Event.src_ip.contains(ip_filter)) |
-                (Event.dst_ip.contains(ip_filter))
-            )
-
-        # Get total count
-        total = query.count()
-
-        # Apply pagination
-        offset = (page - 1) * per_page
-        events = query.order_by(Event.timestamp.desc()).offset(offset).limit(per_page).all()
-
-        result = {
-            'events': [event.to_dict() for event in events],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'pages': (total + per_page - 1) // per_page
-            }
-        }
-
-        close_db_session(session)
-        return jsonify(result)
+        return _json_response({
+            'events': _event_rows(page_data['events']),
+            'pagination': _page_info(page, per_page, page_data)
+        })
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error getting events: {str(e)}")
         return jsonify({'error': 'Failed to get events'}), 500
@@ -66,65 +88,83 @@ def get_events():
 
 @api_bp.route('/responses')
 def get_responses():
-    """Get responses with pagination and filters"""
+    """Get responses with pagination and filters (cursor as for /events)"""
     try:
         page = safe_int(request.args.get('page', 1), 1)
-        per_page = min(safe_int(request.args.get('per_page', 20), 20), 100)
+        per_page = max(1, min(safe_int(request.args.get('per_page', 20), 20), 100))
+        cursor = request.args.get('cursor') or None
         response_type = sanitize_string(request.args.get('type', 'all'))
         status_filter = sanitize_string(request.args.get('status', 'all'))
 
-        session = get_db_session()
-        query = session.query(Response)
+        page_data = response_repo.get_paginated(
+            cursor=cursor, per_page=per_page,
+            filters={'type': response_type, 'status': status_filter},
+            include_total=True, page=page, as_rows=True
+        )
 
-        # Apply filters
-        if response_type == 'type1':
-            query = query.filter(Response.anomaly_type1.isnot(None))
-        elif response_type == 'type2':
-            query = query.filter(Response.anomaly_type2.isnot(None))
+        return _json_response({
+            'responses': _response_rows(page_data['responses']),
+            'pagination': _page_info(page, per_page, page_data)
+        })
 
-        if status_filter == 'success':
-            query = query.filter(Response.success == True)
-        elif status_filter == 'failed':
-            query = query.filter(Response.success == False)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting responses: {str(e)}")
+        return jsonify({'error': 'Failed to get responses'}), 500
 
-        # Get total count
-        total = query.count()
 
-        # Apply pagination
-        offset = (page - 1) * per_page
-        responses = query.order_by(Response.timestamp.desc()).offset(offset).limit(per_page).all()
+def _status_counts():
+    """Event and response totals in one round trip (conditional aggregates)"""
+    with session_scope() as session:
+        row = session.execute(select(
+            select(func.count(Event.id)).scalar_subquery().label('total_events'),
+            select(func.sum(case((Event.is_anomalous == True, 1), else_=0)))
+            .scalar_subquery().label('total_anomalies'),
+            select(func.count(Response.id)).scalar_subquery().label('total_responses'),
+            select(func.sum(case((Response.success == True, 1), else_=0)))
+            .scalar_subquery().label('successful_responses')
+        )).one()
+        return row._asdict()
+
+
+def _compute_metrics():
+    """Last-hour event/anomaly counts (one filtered aggregate) and the five busiest
+    source IPs (counted from the (src_ip, dst_ip) index alone)"""
+    with session_scope() as session:
+        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
 
-        result = {
-            'responses': [response.to_dict() for response in responses],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'pages': (total + per_page - 1) // per_page
-            }
+        recent = session.execute(
+            select(
+                func.count().label('events'),
+                func.sum(case((Event.is_anomalous == True, 1), else_=0)).label('anomalies')
+            ).where(Event.timestamp >= one_hour_ago)
+        ).one()
+
+        top_ips = session.execute(
+            select(Event.src_ip, func.count().label('count'))
+            .group_by(Event.src_ip)
+            .order_by(func.count().desc())
+            .limit(5)
+        ).all()
+
+        return {
+            'recent_events': recent.events,
+            'recent_anomalies': recent.anomalies or 0,
+            'top_ips': [{'ip': ip, 'count': count} for ip, count in top_ips]
         }
 
-        close_db_session(session)
-        return jsonify(result)
-
-    except Exception as e:
-        logger.error(f"Error getting responses: {str(e)}")
-        return jsonify({'error': 'Failed to get responses'}), 500
-
 
 @api_bp.route('/status')
+@short_cache(2)
 def get_status():
     """Get system status and metrics"""
     try:
         from utils.core import state_manager
 
-        session = get_db_session()
-
-        # Get counts
-        total_events = session.query(Event).count()
-        total_anomalies = session.query(Event).filter(Event.is_anomalous == True).count()
-        total_responses = session.query(Response).count()
-        successful_responses = session.query(Response).filter(Response.success == True).count()
+        counts = _aggregates.get_or_set('status', _status_counts)
+        total_responses = counts['total_responses']
+        successful_responses = counts['successful_responses'] or 0
 
         # Calculate success rate
         success_rate = 0
@@ -134,13 +174,12 @@ def get_status():
         result = {
             'monitoring_status': state_manager.get_status(),
             'uptime_seconds': state_manager.get_uptime(),
-            'total_events': total_events,
-            'total_anomalies': total_anomalies,
+            'total_events': counts['total_events'],
+            'total_anomalies': counts['total_anomalies'] or 0,
             'total_responses': total_responses,
             'success_rate': success_rate
         }
 
-        close_db_session(session)
         return jsonify(result)
 
     except Exception as e:
@@ -149,36 +188,20 @@ def get_status():
 
 
 @api_bp.route('/metrics')
+@short_cache(2)
 def get_metrics():
     """Get real-time metrics for charts"""
     try:
-        session = get_db_session()
-
-        # Recent events (last hour)
-        from datetime import datetime, timedelta
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-
-        recent_events = session.query(Event).filter(Event.timestamp >= one_hour_ago).count()
-        recent_anomalies = session.query(Event).filter(
-            Event.timestamp >= one_hour_ago,
-            Event.is_anomalous == True
-        ).count()
-
-        # Top source IPs
-        from sqlalchemy import func
-        top_ips = session.query(
-            Event.src_ip,
-            func.count(Event.id).label('count')
-        ).group_by(Event.src_ip).order_by(func.count(Event.id).desc()).limit(5).all()
+        metrics = _metrics_cache.get_or_set('metrics', _compute_metrics)
+        recent_events = metrics['recent_events']
 
         result = {
             'recent_events': recent_events,
-            'recent_anomalies': recent_anomalies,
+            'recent_anomalies': metrics['recent_anomalies'],
             'packets_per_sec': recent_events // 3600 if recent_events else 0,  # Rough estimate
-            'top_ips': [{'ip': ip, 'count': count} for ip, count in top_ips]
+            'top_ips': metrics['top_ips']
         }
 
-        close_db_session(session)
         return jsonify(result)
 
     except Exception as e:
@@ -186,79 +209,41 @@ def get_metrics():
         return jsonify({'error': 'Failed to get metrics'}), 500
 
 
-def get_paginated_events(page, per_page, filters):
+def get_paginated_events(page, per_page, filters, cursor=None):
     """Helper function for WebSocket - get paginated events"""
     try:
-        session = get_db_session()
-        query = session.query(Event)
-
-        # Apply filters
-        if filters.get('type') == 'anomalous':
-            query = query.filter(Event.is_anomalous == True)
-        elif filters.get('type') == 'normal':
-            query = query.filter(Event.is_anomalous == False)
-
+        filters = dict(filters)
         if filters.get('ip'):
-            ip_filter = sanitize_string(filters['ip'])
-            query = query.filter(
-                (Event.src_ip.contains(ip_filter)) |
-                (Event.dst_ip.contains(ip_filter))
-            )
+            filters['ip'] = sanitize_string(filters['ip'])
 
-        total = query.count()
-        offset = (page - 1) * per_page
-        events = query.order_by(Event.timestamp.desc()).offset(offset).limit(per_page).all()
+        page_data = events_repo.get_paginated(
+            cursor=cursor, per_page=per_page, filters=filters, include_total=True, page=page,
+            as_rows=True
+        )
 
-        result = {
-            'events': [event.to_dict() for event in events],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total
-            }
+        return {
+            'events': _event_rows(page_data['events']),
+            'pagination': _page_info(page, per_page, page_data)
         }
 
-        close_db_session(session)
-        return result
-
     except Exception as e:
         logger.error(f"Error getting paginated events: {str(e)}")
         return {'events': [], 'pagination': {'page': 1, 'per_page': per_page, 'total': 0}}
 
 
-def get_paginated_responses(page, per_page, filters):
+def get_paginated_responses(page, per_page, filters, cursor=None):
     """Helper function for WebSocket - get paginated responses"""
     try:
-        session = get_db_session()
-        query = session.query(Response)
-
-        # Apply filters
-        if filters.get('type') == 'type1':
-            query = query.filter(Response.anomaly_type1.isnot(None))
-        elif filters.get('type') == 'type2':
-            query = query.filter(Response.anomaly_type2.isnot(None))
-
-        if filters.get('status') == 'success':
-            query = query.filter(Response.success == True)
-        elif filters.get('status') == 'failed':
-            query = query.filter(Response.success == False)
-
-        total = query.count()
-        offset = (page - 1) * per_page
-        responses = query.order_by(Response.timestamp.desc()).offset(offset).limit(per_page).all()
-
-        result = {
-            'responses': [response.to_dict() for response in responses],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total
-            }
+        page_data = response_repo.get_paginated(
+            cursor=cursor, per_page=per_page, filters=filters, include_total=True, page=page,
+            as_rows=True
+        )
+
+        return {
+            'responses': _response_rows(page_data['responses']),
+            'pagination': _page_info(page, per_page, page_data)
         }
 
-        close_db_session(session)
-        return result
-
     except Exception as e:
         logger.error(f"Error getting paginated responses: {str(e)}")
-        return {'responses': [], 'pagination': {'page': 1, 'per_page': per_page, 'total': 0}}
\ No newline at end of file
+        return {'responses': [], 'pagination': {'page': 1, 'per_page': per_page, 'total': 0}}
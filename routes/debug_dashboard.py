@@ -6,13 +6,25 @@ Dependencies: Flask, db, utils
 
 from flask import Blueprint, render_template, jsonify, request
 from db.database import get_database_stats, check_database_health
-from utils.core import state_manager
+from utils.core import short_cache, state_manager
 from model.model import get_model_status
+import os
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 debug_bp = Blueprint('debug', __name__)
 
+# psutil samples are taken by a background thread; /system only reads the latest
+SYSTEM_SAMPLE_SECONDS = 1
+_sys_cache = {}
+_sampler_lock = threading.Lock()
+_sampler_thread = None
+
+# Read size when tailing logs/app.log backwards
+TAIL_BLOCK_SIZE = 8192
+
 
 @debug_bp.route('/')
 def dashboard():
@@ -20,38 +32,74 @@ def dashboard():
     return render_template('debug/dashboard.html')
 
 
+def _sample_system(process, interval=SYSTEM_SAMPLE_SECONDS):
+    """One snapshot of host and process metrics, shaped like the /system payload
+
+    Blocks for the measurement interval; interval=None returns immediately with
+    CPU use since the previous call.
+    """
+    import psutil
+
+    cpu_percent = psutil.cpu_percent(interval=interval)
+    memory = psutil.virtual_memory()
+    disk = psutil.disk_usage('/')
+
+    return {
+        'system': {
+            'cpu_percent': round(cpu_percent, 1),
+            'memory_percent': round(memory.percent, 1),
+            'memory_used_mb': memory.used // (1024 * 1024),
+            'memory_total_mb': memory.total // (1024 * 1024),
+            'disk_percent': round(disk.percent, 1),
+            'disk_used_gb': disk.used // (1024 * 1024 * 1024),
+            'disk_total_gb': disk.total // (1024 * 1024 * 1024)
+        },
+        'process': {
+            'pid': process.pid,
+            'memory_mb': process.memory_info().rss // (1024 * 1024),
+            # Non-blocking: CPU use since the previous sample
+            'cpu_percent': round(process.cpu_percent(), 1),
+            'num_threads': process.num_threads(),
+            'create_time': process.create_time()
+        }
+    }
+
+
+def _run_system_sampler(process):
+    """Refresh _sys_cache once per sample window for the lifetime of the process"""
+    while True:
+        try:
+            # Replace the whole snapshot so readers never see a partial update
+            _sys_cache['sample'] = _sample_system(process)
+        except Exception as e:
+            logger.error(f"Error sampling system metrics: {str(e)}")
+            time.sleep(SYSTEM_SAMPLE_SECONDS)
+
+
+def _ensure_system_sampler():
+    """Start the background sampler on first use, seeding the cache without blocking"""
+    global _sampler_thread
+
+    with _sampler_lock:
+        if _sampler_thread is None:
+            import psutil
+
+            process = psutil.Process(os.getpid())
+            _sys_cache['sample'] = _sample_system(process, interval=None)
+            _sampler_thread = threading.Thread(
+                target=_run_system_sampler, args=(process,), name='system-sampler', daemon=True
+            )
+            _sampler_thread.start()
+
+
 @debug_bp.route('/system')
 def system_status():
-    """System status information"""
+    """System status information (served from the background sampler)"""
     try:
-        import psutil
-        import os
-
-        # System metrics
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-
-        # Process info
-        process = psutil.Process(os.getpid())
+        _ensure_system_sampler()
 
         return jsonify({
-            'system': {
-                'cpu_percent': round(cpu_percent, 1),
-                'memory_percent': round(memory.percent, 1),
-                'memory_used_mb': memory.used // (1024 * 1024),
-                'memory_total_mb': memory.total // (1024 * 1024),
-                'disk_percent': round(disk.percent, 1),
-                'disk_used_gb': disk.used // (1024 * 1024 * 1024),
-                'disk_total_gb': disk.total // (1024 * 1024 * 1024)
-            },
-            'process': {
-                'pid': process.pid,
-                'memory_mb': process.memory_info().rss // (1024 * 1024),
-                'cpu_percent': round(process.cpu_percent(), 1),
-                'num_threads': process.num_threads(),
-                'create_time': process.create_time()
-            },
+            **_sys_cache['sample'],
             'monitoring': {
                 'status': state_manager.get_status(),
                 'uptime_seconds': round(state_manager.get_uptime(), 1)
@@ -64,6 +112,7 @@ def system_status():
 
 
 @debug_bp.route('/database')
+@short_cache(2)
 def database_status():
     """Database status and statistics"""
     try:
@@ -81,6 +130,7 @@ def database_status():
 
 
 @debug_bp.route('/model')
+@short_cache(2)
 def model_status():
     """ML model status"""
     try:
@@ -92,6 +142,42 @@ def model_status():
         return jsonify({'error': str(e)}), 500
 
 
+def _tail(path, n, level=None):
+    """Last n lines of a file (containing level, if given), oldest first
+
+    Reads fixed-size blocks backwards from the end and stops as soon as enough
+    lines are collected, so memory and I/O do not grow with the file size.
+    """
+    found = []
+
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        partial = b''  # start of the line cut by the previous block boundary
+        at_end = True
+
+        while position > 0 and len(found) < n:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            pieces = (f.read(step) + partial).split(b'\n')
+            if at_end and pieces[-1] == b'':
+                pieces.pop()  # the file's trailing newline
+            at_end = False
+
+            # The first piece may continue into the block before this one
+            partial = pieces.pop(0) if position > 0 else b''
+
+            for raw in reversed(pieces):
+                line = raw.decode('utf-8', errors='replace') + '\n'
+                if level is None or level in line:
+                    found.append(line)
+                    if len(found) >= n:
+                        break
+
+    found.reverse()
+    return found
+
+
 @debug_bp.route('/logs')
 def get_logs():
     """Get recent log entries"""
@@ -104,12 +190,8 @@ def get_logs():
         log_file = Path('logs/app.log')
 
         if log_file.exists():
-            with open(log_file, 'r') as f:
-                log_lines = f.readlines()[-lines:]
-
-            # Filter by log level if specified
-            if log_level != 'ALL':
-                log_lines = [line for line in log_lines if log_level in line]
+            # Last `lines` entries at the requested level, read backwards from the end
+            log_lines = _tail(log_file, lines, None if log_level == 'ALL' else log_level)
 
             return jsonify({
                 'logs': log_lines,
@@ -4,16 +4,36 @@ Purpose: ML anomaly prediction and RCA forwarding
 Dependencies: model, db, utils, RCA routes
 """
 
+import atexit
 import logging
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-from model.model import predict_anomaly, get_model_status
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, case, func
+
+from model.model import predict_anomaly, predict_anomaly_batch, get_model_status
 from db.database import get_db_session, close_db_session
 from db.models.events import Event
-from utils.core import generate_anomaly_id
+from utils.core import generate_anomaly_id, stats_cache, send_real_time_update
+from config import Config
+from routes.rca_type1 import analyze_rule_based, analyze_rule_based_batch
+from routes.rca_type2 import diagnose_network_issues, respond_to_diagnoses
 
 logger = logging.getLogger(__name__)
 
+# RCA Type 1 features from config, in order
+_RCA_FEATURE_NAMES = Config.RCA_TYPE1_FEATURES
+
+# Positions of the RCA features within the 35-feature model vector
+_RCA_COLUMNS = np.array([Config.IMPORTANT_FEATURE_INDEX[name] for name in _RCA_FEATURE_NAMES])
+
+# Runs RCA Type 2 diagnosis alongside RCA Type 1
+RCA_TIMEOUT_SECONDS = 30
+_RCA_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='rca')
+atexit.register(_RCA_POOL.shutdown, wait=False, cancel_futures=True)
+
 
 def predict_anomaly_internal(log_id, imp_features):
     """Internal prediction function called by preprocessing"""
@@ -22,22 +42,7 @@ def predict_anomaly_internal(log_id, imp_features):
         prediction_result = predict_anomaly(imp_features)
 
         if prediction_result.get('is_anomalous', False):
-            logger.info(f"Anomaly detected for log_id: {log_id}")
-
-            # Extract reduced features for RCA analysis
-            re_features = extract_reduced_features(imp_features)
-
-            # Forward to RCA routes in parallel
-            rca_results = forward_to_rca(log_id, re_features)
-
-            # Send real-time update
-            send_anomaly_update(log_id, prediction_result)
-
-            return {
-                'is_anomalous': True,
-                'prediction': prediction_result,
-                'rca_initiated': rca_results
-            }
+            return handle_anomaly(log_id, imp_features, prediction_result)
         else:
             logger.debug(f"Normal traffic for log_id: {log_id}")
             return {
@@ -53,29 +58,104 @@ def predict_anomaly_internal(log_id, imp_features):
         }
 
 
-def extract_reduced_features(imp_features):
-    """Extract 9 features for RCA Type 1 analysis"""
-    # RCA Type 1 features from config
-    rca_feature_names = [
-        'Flow Duration', 'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
-        'Flow Bytes/s', 'Flow Packets/s', 'Fwd Header Length', 'Bwd Header Length',
-        'Max Packet Length', 'Packet Length Mean'
+def predict_anomaly_batch_internal(feature_matrix):
+    """Predict a whole (N, 35) feature matrix in one model pass; no RCA side effects"""
+    try:
+        return predict_anomaly_batch(feature_matrix)
+
+    except Exception as e:
+        logger.error(f"Error in batch anomaly prediction: {str(e)}")
+        return [{'is_anomalous': False, 'error': str(e)} for _ in range(len(feature_matrix))]
+
+
+def handle_anomaly(log_id, imp_features, prediction_result):
+    """Run RCA and notify clients for one flow predicted anomalous"""
+    logger.info(f"Anomaly detected for log_id: {log_id}")
+
+    # Extract reduced features for RCA analysis
+    re_features = extract_reduced_features(imp_features)
+
+    # Forward to RCA routes in parallel
+    rca_results = forward_to_rca(log_id, re_features)
+
+    # Send real-time update
+    send_anomaly_update(log_id, prediction_result)
+
+    return {
+        'is_anomalous': True,
+        'prediction': prediction_result,
+        'rca_initiated': rca_results
+    }
+
+
+def handle_anomalies(log_ids, feature_matrix, predictions):
+    """Run RCA for a batch of anomalous flows and notify clients for each
+
+    feature_matrix holds the flows' 35 important features (Config.IMPORTANT_FEATURES
+    order); the RCA columns are gathered from it in one step.
+    """
+    # Send real-time updates first; RCA responses for the batch can take minutes
+    for log_id, prediction_result in zip(log_ids, predictions):
+        logger.info(f"Anomaly detected for log_id: {log_id}")
+        send_anomaly_update(log_id, prediction_result)
+
+    # Extract reduced features for RCA analysis
+    re_matrix = extract_reduced_features_batch(feature_matrix)
+
+    # Forward to RCA routes, one call per route for the whole batch
+    rca_results = forward_to_rca_batch(log_ids, re_matrix)
+
+    return [
+        {'is_anomalous': True, 'prediction': prediction_result, 'rca_initiated': rca_result}
+        for prediction_result, rca_result in zip(predictions, rca_results)
     ]
 
-    re_features = {}
-    for feature in rca_feature_names:
-        re_features[feature] = imp_features.get(feature, 0.0)
 
-    return re_features
+def forward_to_rca_batch(log_ids, re_matrix):
+    """Forward a batch of flows to both RCA routes, one call per route
+
+    Type 2's event lookup and troubleshooting checks run on _RCA_POOL while Type 1
+    classifies and responds on this thread. Type 2 responses are triggered only
+    after Type 1 finishes, because they update the response records it creates.
+    """
+    diagnoses = _RCA_POOL.submit(diagnose_network_issues, log_ids)
+
+    try:
+        rca1_results = analyze_rule_based_batch(log_ids, re_matrix)
+    except Exception as e:
+        logger.error(f"Error in RCA Type 1: {str(e)}")
+        rca1_results = [{'error': str(e)} for _ in log_ids]
+
+    try:
+        rca2_results = respond_to_diagnoses(log_ids, diagnoses.result(timeout=RCA_TIMEOUT_SECONDS))
+    except Exception as e:
+        logger.error(f"Error in RCA Type 2: {str(e)}")
+        rca2_results = [{'error': str(e)} for _ in log_ids]
+
+    return [
+        {'rca_type1': rca1_result, 'rca_type2': rca2_result}
+        for rca1_result, rca2_result in zip(rca1_results, rca2_results)
+    ]
+
+
+def extract_reduced_features_batch(feature_matrix):
+    """Extract the 9 RCA Type 1 columns from an (N, 35) feature matrix"""
+    return np.asarray(feature_matrix)[:, _RCA_COLUMNS]
+
+
+def extract_reduced_features(imp_features):
+    """Extract 9 features for RCA Type 1 analysis from a single flow's feature dict"""
+    get = imp_features.get
+    return {feature: get(feature, 0.0) for feature in _RCA_FEATURE_NAMES}
 
 
 def forward_to_rca(log_id, re_features):
-    """Forward to both RCA routes in parallel"""
+    """Forward to both RCA routes in parallel (ordered as in forward_to_rca_batch)"""
+    diagnoses = _RCA_POOL.submit(diagnose_network_issues, [log_id])
     results = {}
 
     try:
         # RCA Type 1 (Rule-based analysis)
-        from routes.rca_type1 import analyze_rule_based
         rca1_result = analyze_rule_based(log_id, re_features)
         results['rca_type1'] = rca1_result
 
@@ -85,8 +165,7 @@ def forward_to_rca(log_id, re_features):
 
     try:
         # RCA Type 2 (Network troubleshooting)
-        from routes.rca_type2 import analyze_network_troubleshooting
-        rca2_result = analyze_network_troubleshooting(log_id)
+        rca2_result = respond_to_diagnoses([log_id], diagnoses.result(timeout=RCA_TIMEOUT_SECONDS))[0]
         results['rca_type2'] = rca2_result
 
     except Exception as e:
@@ -99,8 +178,6 @@ def forward_to_rca(log_id, re_features):
 def send_anomaly_update(log_id, prediction_result):
     """Send real-time anomaly notification"""
     try:
-        from app import send_real_time_update
-
         # Get event details from database
         session = get_db_session()
         event = session.query(Event).filter(Event.log_id == log_id).first()
@@ -126,9 +203,6 @@ def send_anomaly_update(log_id, prediction_result):
 def batch_predict(csv_file_path):
     """Batch prediction for testing (process entire CSV file)"""
     try:
-        import pandas as pd
-        from config import Config
-
         # Read CSV
         df = pd.read_csv(csv_file_path)
 
@@ -166,35 +240,41 @@ def batch_predict(csv_file_path):
         return {'error': str(e)}
 
 
+def _prediction_counts():
+    """Total and last-hour event/anomaly counts in one pass over events"""
+    session = get_db_session()
+    try:
+        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
+        is_recent = Event.timestamp >= one_hour_ago
+
+        total_events, total_anomalies, recent_events, recent_anomalies = session.query(
+            func.count(Event.id),
+            func.sum(case((Event.is_anomalous == True, 1), else_=0)),
+            func.sum(case((is_recent, 1), else_=0)),
+            func.sum(case((and_(is_recent, Event.is_anomalous == True), 1), else_=0))
+        ).one()
+    finally:
+        close_db_session(session)
+
+    return total_events, total_anomalies or 0, recent_events or 0, recent_anomalies or 0
+
+
 def get_prediction_stats():
     """Get prediction statistics"""
     try:
         # Get model status
         model_status = get_model_status()
 
-        # Get database statistics
-        session = get_db_session()
-
-        total_events = session.query(Event).count()
-        total_anomalies = session.query(Event).filter(Event.is_anomalous == True).count()
+        # Get database statistics (cached briefly, cleared on writes)
+        total_events, total_anomalies, recent_events, recent_anomalies = stats_cache.get_or_set(
+            'prediction_counts', _prediction_counts
+        )
 
         # Calculate statistics
         anomaly_rate = 0
         if total_events > 0:
             anomaly_rate = (total_anomalies / total_events) * 100
 
-        # Get recent statistics (last hour)
-        from datetime import timedelta
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-
-        recent_events = session.query(Event).filter(Event.timestamp >= one_hour_ago).count()
-        recent_anomalies = session.query(Event).filter(
-            Event.timestamp >= one_hour_ago,
-            Event.is_anomalous == True
-        ).count()
-
-        close_db_session(session)
-
         return {
             'model_status': model_status,
             'total_events': total_events,
@@ -5,19 +5,67 @@ Dependencies: pandas, db models, utils, routes
 """
 
 import pandas as pd
+import numpy as np
 import logging
 from datetime import datetime
 from pathlib import Path
 import threading
 import time
 
+from sqlalchemy import update
+from watchdog.events import PatternMatchingEventHandler
+from watchdog.observers import Observer
+
 from db.database import get_db_session, close_db_session
 from db.models.events import Event
-from utils.core import generate_log_id, state_manager
+from routes.predict_anomaly import predict_anomaly_batch_internal, handle_anomalies
+from utils.core import generate_log_id, state_manager, stats_cache, send_real_time_update
 from utils.data_generator import DataGenerator
 
 logger = logging.getLogger(__name__)
 
+# Capture files written by the data generator
+CSV_PATTERN = 'network_data_*.csv'
+
+# Re-check the directory this often even without file events (e.g. on NFS)
+FALLBACK_POLL_SECONDS = 60
+
+# A CSV is read only once it has gone this long without being written to
+FILE_SETTLE_SECONDS = 2
+
+# Rows read and processed per batch; bounds memory for large capture files
+CSV_CHUNK_ROWS = 100_000
+
+# Non-feature columns used for event metadata
+METADATA_COLUMNS = frozenset({'Timestamp', 'Src IP', 'Dst IP', 'Src Port', 'Dst Port'})
+
+# Parse these as text up front; feature columns are coerced to numbers per chunk
+CSV_TEXT_DTYPES = {'Timestamp': str, 'Src IP': str, 'Dst IP': str}
+
+# Attempts at a file whose chunks keep failing to save before it is skipped
+MAX_FILE_ATTEMPTS = 3
+
+# log_ids per UPDATE ... WHERE log_id IN (...), well under SQLite's bind-variable limit
+UPDATE_BATCH_SIZE = 500
+
+
+class _CsvEventHandler(PatternMatchingEventHandler):
+    """Wake the processing loop when a capture CSV is created or closed after writing
+
+    Created files are usually still being written; the loop waits for them to
+    settle. Close events (inotify only) arrive once the writer is done.
+    """
+
+    def __init__(self, wake):
+        super().__init__(patterns=[CSV_PATTERN], ignore_directories=True)
+        self._wake = wake
+
+    def on_created(self, event):
+        self._wake.set()
+
+    def on_closed(self, event):
+        self._wake.set()
+
 
 class PreprocessingEngine:
     """Simple preprocessing engine for CSV files"""
@@ -25,9 +73,17 @@ class PreprocessingEngine:
     def __init__(self, data_directory, important_features):
         self.data_directory = Path(data_directory)
         self.important_features = important_features
+        # Columns read from each CSV: model features plus network metadata
+        self._needed_columns = frozenset(important_features) | METADATA_COLUMNS
         self.processing = False
         self.thread = None
+        self.observer = None
+        self._wake = threading.Event()
         self.last_processed = None
+        # CSV path -> chunks committed so far, kept while a file has failed part-way
+        self._chunks_done = {}
+        # CSV path -> failed attempts, for the latest file only
+        self._attempts = {}
 
     def start_processing(self):
         """Start preprocessing loop"""
@@ -35,6 +91,7 @@ class PreprocessingEngine:
             return True
 
         self.processing = True
+        self._start_observer()
         self.thread = threading.Thread(target=self._processing_loop, daemon=True)
         self.thread.start()
         logger.info("Preprocessing started")
@@ -43,34 +100,60 @@ class PreprocessingEngine:
     def stop_processing(self):
         """Stop preprocessing loop"""
         self.processing = False
+        self._wake.set()
+        if self.observer:
+            self.observer.stop()
+            self.observer.join(timeout=5)
+            self.observer = None
         if self.thread:
             self.thread.join(timeout=5)
         logger.info("Preprocessing stopped")
 
+    def _start_observer(self):
+        """Watch the data directory for CSV writes; falls back to polling if unavailable"""
+        try:
+            self.data_directory.mkdir(parents=True, exist_ok=True)
+            self.observer = Observer()
+            self.observer.schedule(_CsvEventHandler(self._wake), str(self.data_directory), recursive=False)
+            self.observer.daemon = True
+            self.observer.start()
+        except Exception as e:
+            self.observer = None
+            logger.warning(f"File watcher unavailable, polling every {FALLBACK_POLL_SECONDS}s: {str(e)}")
+
     def _processing_loop(self):
-        """Main processing loop - checks for new CSV files"""
+        """Main processing loop - runs on CSV file events, or every FALLBACK_POLL_SECONDS"""
         while self.processing:
             try:
-                if state_manager.is_monitoring():
-                    self._process_latest_csv()
-                time.sleep(10)  # Check every 10 seconds
+                pending = state_manager.is_monitoring() and self._process_latest_csv()
+                # Come back soon for a file that is still being written
+                self._wake.wait(FILE_SETTLE_SECONDS if pending else FALLBACK_POLL_SECONDS)
+                self._wake.clear()
             except Exception as e:
                 logger.error(f"Error in processing loop: {str(e)}")
                 time.sleep(30)  # Wait longer on error
 
     def _process_latest_csv(self):
-        """Process the latest CSV file"""
+        """Process the latest CSV file; returns True if it is still being written"""
         try:
             # Get latest CSV file
-            csv_files = list(self.data_directory.glob('network_data_*.csv'))
+            csv_files = [(path.stat().st_mtime, path) for path in self.data_directory.glob(CSV_PATTERN)]
             if not csv_files:
-                return
+                return False
 
-            latest_file = max(csv_files, key=lambda x: x.stat().st_mtime)
+            mtime, latest_file = max(csv_files)
 
             # Skip if already processed
             if self.last_processed == latest_file:
-                return
+                return False
+
+            # Wait until the writer has finished with it
+            if time.time() - mtime < FILE_SETTLE_SECONDS:
+                return True
+
+            # Progress kept for files superseded by a newer one is no longer needed
+            key = str(latest_file)
+            self._chunks_done = {key: self._chunks_done[key]} if key in self._chunks_done else {}
 
             logger.info(f"Processing file: {latest_file.name}")
 
@@ -79,65 +162,60 @@ class PreprocessingEngine:
 
             if results['success']:
                 self.last_processed = latest_file
+                self._attempts = {}
                 logger.info(f"Processed {results['processed_count']} rows from {latest_file.name}")
+            else:
+                attempts = self._attempts.get(key, 0) + 1
+                self._attempts = {key: attempts}
+                if attempts >= MAX_FILE_ATTEMPTS:
+                    # Give up rather than retrying the same failure every poll
+                    logger.error(f"Skipping {latest_file.name} after {attempts} failed attempts")
+                    self.last_processed = latest_file
+                    self._attempts = {}
+                    self._chunks_done.pop(key, None)
 
         except Exception as e:
             logger.error(f"Error processing latest CSV: {str(e)}")
 
+        return False
+
     def process_csv_file(self, file_path):
-        """Process single CSV file"""
-        try:
-            # Read CSV file
-            df = pd.read_csv(file_path)
-            logger.info(f"Read CSV with {len(df)} rows")
+        """Process single CSV file
 
+        The file is streamed in chunks of CSV_CHUNK_ROWS rows, reading only the
+        columns the pipeline uses, so memory stays bounded by the chunk size. Each
+        chunk commits on its own; if the file fails part-way, the next attempt
+        resumes after the last committed chunk.
+        """
+        try:
             processed_count = 0
             anomaly_count = 0
 
-            session = get_db_session()
-
-            for _, row in df.iterrows():
-                try:
-                    # Extract network metadata
-                    metadata = self._extract_metadata(row)
-
-                    # Extract important features
-                    imp_features = self._extract_important_features(row)
-
-                    # Generate unique log ID
-                    log_id = generate_log_id()
-
-                    # Save to database
-                    event = Event(
-                        log_id=log_id,
-                        timestamp=metadata.get('timestamp', datetime.utcnow()),
-                        src_ip=metadata.get('src_ip'),
-                        dst_ip=metadata.get('dst_ip'),
-                        src_port=metadata.get('src_port'),
-                        dst_port=metadata.get('dst_port'),
-                        is_anomalous=False  # Will be updated by prediction
-                    )
-
-                    session.add(event)
-                    session.commit()
-
-                    # Forward to prediction
-                    prediction_result = self._forward_to_prediction(log_id, imp_features)
-
-                    if prediction_result and prediction_result.get('is_anomalous'):
-                        anomaly_count += 1
-                        # Update event with anomaly status
-                        event.is_anomalous = True
-                        session.commit()
-
-                    processed_count += 1
-
-                except Exception as e:
-                    logger.error(f"Error processing row: {str(e)}")
-                    session.rollback()
+            # Read CSV file
+            reader = pd.read_csv(
+                file_path,
+                chunksize=CSV_CHUNK_ROWS,
+                usecols=lambda column: column in self._needed_columns,
+                dtype=CSV_TEXT_DTYPES,
+                na_values=['', 'null'],
+                on_bad_lines='skip'
+            )
+
+            # Chunks already saved by an earlier, failed attempt at this file are skipped
+            key = str(file_path)
+            resume_from = self._chunks_done.get(key, 0)
+
+            for index, chunk in enumerate(reader):
+                if index < resume_from:
                     continue
+                chunk_processed, chunk_anomalies = self._process_chunk(chunk)
+                self._chunks_done[key] = index + 1
+                processed_count += chunk_processed
+                anomaly_count += chunk_anomalies
 
-            close_db_session(session)
+            self._chunks_done.pop(key, None)
+
+            logger.info(f"Read CSV with {processed_count} rows in chunks of {CSV_CHUNK_ROWS}")
 
             # Send real-time update
             self._send_processing_update(processed_count, anomaly_count)
@@ -152,66 +230,162 @@ class PreprocessingEngine:
             logger.error(f"Error processing CSV file: {str(e)}")
             return {'success': False, 'error': str(e)}
 
-    def _extract_metadata(self, row):
-        """Extract network metadata from CSV row"""
+    def _process_chunk(self, df):
+        """Process one chunk of CSV rows as a batch; returns (processed, anomalies)
+
+        Features are pulled out as a single matrix, all events are inserted with
+        one executemany and commit, the model scores every row in one batched pass,
+        and anomalous events are flagged with one UPDATE before RCA runs for each.
+        If the batch insert fails, rows are inserted one by one and the failing
+        ones skipped; raises only if no row could be saved.
+        """
+        if df.empty:
+            return 0, 0
+
+        # Extract important features for every row at once
+        features = self._extract_feature_matrix(df)
+
+        # Network metadata and a unique log ID per row
+        log_ids = [generate_log_id() for _ in range(len(df))]
+        records = [
+            {'log_id': log_id, 'timestamp': timestamp, 'src_ip': src_ip, 'dst_ip': dst_ip,
+             'src_port': src_port, 'dst_port': dst_port, 'is_anomalous': False}
+            for log_id, timestamp, src_ip, dst_ip, src_port, dst_port in zip(log_ids, *self._extract_metadata(df))
+        ]
+
+        session = get_db_session()
         try:
-            # Parse timestamp
-            timestamp = datetime.utcnow()
-            if 'Timestamp' in row and pd.notna(row['Timestamp']):
-                try:
-                    timestamp = pd.to_datetime(row['Timestamp'])
-                except:
-                    pass
+            # Save to database
+            try:
+                Event.bulk_insert(session, records)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.warning(f"Batch insert of {len(records)} events failed, inserting row by row: {str(e)}")
+
+                kept = self._insert_rows(session, records)
+                if not kept:
+                    raise
+                if len(kept) < len(records):
+                    features = features[kept]
+                    log_ids = [log_ids[i] for i in kept]
+                    records = [records[i] for i in kept]
+
+            # New events make cached dashboard counts stale
+            stats_cache.clear()
+
+            # The events are committed from here on, so the chunk counts as processed
+            # even if scoring or flagging fails; retrying it would insert it twice
+            try:
+                # Predict all rows in one batched model pass
+                predictions = self._forward_to_prediction(features)
+                anomalous = [i for i, result in enumerate(predictions) if result.get('is_anomalous')]
+
+                # Update events with anomaly status
+                anomalous_ids = [log_ids[i] for i in anomalous]
+                for start in range(0, len(anomalous_ids), UPDATE_BATCH_SIZE):
+                    session.execute(
+                        update(Event)
+                        .where(Event.log_id.in_(anomalous_ids[start:start + UPDATE_BATCH_SIZE]))
+                        .values(is_anomalous=True)
+                    )
+                session.commit()
+                stats_cache.clear()
 
-            return {
-                'timestamp': timestamp,
-                'src_ip': str(row.get('Src IP', '')),
-                'dst_ip': str(row.get('Dst IP', '')),
-                'src_port': int(row.get('Src Port', 0)) if pd.notna(row.get('Src Port')) else None,
-                'dst_port': int(row.get('Dst Port', 0)) if pd.notna(row.get('Dst Port')) else None
-            }
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error flagging anomalies in {len(records)} saved events: {str(e)}")
+                return len(records), 0
 
-        except Exception as e:
-            logger.error(f"Error extracting metadata: {str(e)}")
-            return {
-                'timestamp': datetime.utcnow(),
-                'src_ip': 'unknown',
-                'dst_ip': 'unknown',
-                'src_port': None,
-                'dst_port': None
-            }
+        finally:
+            close_db_session(session)
+
+        # RCA and notifications for anomalous flows, as one batch
+        if anomalous:
+            self._forward_anomalies(
+                [log_ids[i] for i in anomalous], features[anomalous], [predictions[i] for i in anomalous]
+            )
 
-    def _extract_important_features(self, row):
-        """Extract the 35 important features for ML model"""
-        features = {}
+        return len(records), len(anomalous)
 
-        for feature in self.important_features:
+    def _insert_rows(self, session, records):
+        """Insert events one at a time, skipping rows that fail; returns the saved row indexes"""
+        kept = []
+        for index, record in enumerate(records):
             try:
-                value = row.get(feature, 0.0)
-                # Convert to float, handle NaN/inf
-                if pd.isna(value) or value in [float('inf'), float('-inf')]:
-                    value = 0.0
-                features[feature] = float(value)
-            except:
-                features[feature] = 0.0
-
-        return features
-
-    def _forward_to_prediction(self, log_id, imp_features):
-        """Forward features to prediction route"""
+                Event.bulk_insert(session, [record])
+                session.commit()
+                kept.append(index)
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Skipping event row {index} of chunk: {str(e)}")
+        return kept
+
+    def _extract_metadata(self, df):
+        """Extract network metadata for a chunk as per-row column lists
+
+        Returns (timestamps, src_ips, dst_ips, src_ports, dst_ports). Unparseable
+        timestamps become the current time, missing IPs 'unknown' and missing
+        or non-numeric ports None.
+        """
+        rows = len(df)
+
+        # Parse timestamps
+        if 'Timestamp' in df:
+            timestamps = pd.to_datetime(df['Timestamp'], errors='coerce')
+            timestamps = timestamps.fillna(pd.Timestamp(datetime.utcnow())).tolist()
+        else:
+            timestamps = [datetime.utcnow()] * rows
+
+        def ips(column):
+            if column not in df:
+                return ['unknown'] * rows
+            return df[column].fillna('unknown').astype(str).tolist()
+
+        def ports(column):
+            if column not in df:
+                return [None] * rows
+            values = pd.to_numeric(df[column], errors='coerce').astype('float64')
+            # Infinite or out-of-range ports become None for that row only
+            values = np.trunc(values.where(np.isfinite(values) & values.between(0, 65535)))
+            values = values.astype('Int64').astype(object)
+            return values.where(values.notna(), None).tolist()
+
+        return timestamps, ips('Src IP'), ips('Dst IP'), ports('Src Port'), ports('Dst Port')
+
+    def _extract_feature_matrix(self, df):
+        """Extract the 35 important features for ML model as an (N, 35) float64 matrix
+
+        Kept at full precision: RCA Type 1 thresholds and the stored re_features
+        use these values; the model casts its own float32 copy.
+
+        Missing columns, non-numeric values, NaN and infinities all become 0.0.
+        """
+        features = df.reindex(columns=list(self.important_features), fill_value=0.0)
+        features = features.apply(pd.to_numeric, errors='coerce')
+        return features.replace([np.inf, -np.inf], 0.0).fillna(0.0).to_numpy(dtype=np.float64)
+
+    def _forward_to_prediction(self, features):
+        """Forward the feature matrix to the prediction route; one result per row"""
         try:
-            from routes.predict_anomaly import predict_anomaly_internal
-            return predict_anomaly_internal(log_id, imp_features)
+            return predict_anomaly_batch_internal(features)
 
         except Exception as e:
             logger.error(f"Error forwarding to prediction: {str(e)}")
+            return [{} for _ in range(len(features))]
+
+    def _forward_anomalies(self, log_ids, features, predictions):
+        """Hand anomalous flows to the prediction route's batched RCA/notification path"""
+        try:
+            return handle_anomalies(log_ids, features, predictions)
+
+        except Exception as e:
+            logger.error(f"Error handling {len(log_ids)} anomalies: {str(e)}")
             return None
 
     def _send_processing_update(self, processed_count, anomaly_count):
         """Send real-time update via WebSocket"""
         try:
-            from app import send_real_time_update
-
             send_real_time_update('processing_update', {
                 'processed_count': processed_count,
                 'anomaly_count': anomaly_count,
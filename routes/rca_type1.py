@@ -4,17 +4,38 @@ Purpose: Threshold-based anomaly classification
 Dependencies: config, utils, trigger_response route
 """
 
+import functools
 import logging
+import numpy as np
+from sqlalchemy import func
+
 from config import Config
+from db.database import get_db_session, close_db_session
+from db.models.response import Response
+from routes.trigger_response import trigger_response1_internal, trigger_response1_batch
+from utils.core import stats_cache
 
 logger = logging.getLogger(__name__)
 
+# Rule-based anomaly types, in rule precedence order
+ANOMALY_TYPES = ('bandwidth_saturation', 'throughput_anomaly', 'header_length', 'packet_size', 'flow_duration')
+_ANOMALY_TYPE_LABELS = np.array(ANOMALY_TYPES + (None,), dtype=object)
+
+# (feature, Type1Thresholds field) pairs checked by each rule, in ANOMALY_TYPES order
+_RULES = (
+    (('Flow Bytes/s', 'flow_bytes_per_sec'), ('Flow Packets/s', 'flow_packets_per_sec')),
+    (('Total Length of Fwd Packets', 'total_fwd_packets'), ('Total Length of Bwd Packets', 'total_bwd_packets')),
+    (('Fwd Header Length', 'fwd_header_length'), ('Bwd Header Length', 'bwd_header_length')),
+    (('Max Packet Length', 'max_packet_length'), ('Packet Length Mean', 'packet_length_mean')),
+    (('Flow Duration', 'flow_duration'),)
+)
+
 
 def analyze_rule_based(log_id, re_features):
     """Analyze features using rule-based thresholds"""
     try:
-        # Get thresholds from config
-        thresholds = Config.RCA_TYPE1_THRESHOLDS
+        # Get thresholds from config (flat snapshot)
+        thresholds = Config.RCA_TYPE1
 
         anomaly_type = classify_anomaly_type(re_features, thresholds)
 
@@ -46,41 +67,118 @@ def analyze_rule_based(log_id, re_features):
         }
 
 
+def analyze_rule_based_batch(log_ids, mat):
+    """Rule-based analysis for many flows with one vectorized classification
+
+    mat is an (N, 9) reduced-feature matrix in Config.RCA_TYPE1_FEATURES order.
+    Returns one analyze_rule_based-style result per log_id, in order.
+    """
+    try:
+        _, labels = classify_anomaly_type_batch(mat, Config.RCA_TYPE1)
+
+    except Exception as e:
+        logger.error(f"Error in RCA Type 1 batch analysis: {str(e)}")
+        return [{'success': False, 'error': str(e)} for _ in log_ids]
+
+    results = []
+    classified = []
+    for log_id, row, anomaly_type in zip(log_ids, mat.tolist(), labels):
+        re_features = dict(zip(Config.RCA_TYPE1_FEATURES, row))
+
+        if anomaly_type:
+            logger.info(f"RCA Type 1 - Detected {anomaly_type} for log_id: {log_id}")
+            result = {
+                'success': True,
+                'anomaly_type': anomaly_type,
+                'features_analyzed': re_features
+            }
+            results.append(result)
+            classified.append((result, (log_id, anomaly_type, re_features)))
+        else:
+            logger.debug(f"RCA Type 1 - No specific anomaly type identified for log_id: {log_id}")
+            results.append({
+                'success': True,
+                'anomaly_type': 'unknown',
+                'features_analyzed': re_features
+            })
+
+    # Forward every classified flow to the response system in one batch
+    if classified:
+        responses = forward_to_response1_batch([item for _, item in classified])
+        for (result, _), response in zip(classified, responses):
+            result['response_triggered'] = response
+
+    return results
+
+
 def classify_anomaly_type(features, thresholds):
-    """Classify anomaly type based on feature thresholds"""
+    """Classify anomaly type based on feature thresholds (a Type1Thresholds snapshot)"""
 
     # Check bandwidth saturation
-    if (features.get('Flow Bytes/s', 0) > thresholds['bandwidth_saturation']['flow_bytes_per_sec'] or
-            features.get('Flow Packets/s', 0) > thresholds['bandwidth_saturation']['flow_packets_per_sec']):
+    if (features.get('Flow Bytes/s', 0) > thresholds.flow_bytes_per_sec or
+            features.get('Flow Packets/s', 0) > thresholds.flow_packets_per_sec):
         return 'bandwidth_saturation'
 
     # Check throughput anomalies
-    if (features.get('Total Length of Fwd Packets', 0) > thresholds['throughput_anomalies']['total_fwd_packets'] or
-            features.get('Total Length of Bwd Packets', 0) > thresholds['throughput_anomalies']['total_bwd_packets']):
+    if (features.get('Total Length of Fwd Packets', 0) > thresholds.total_fwd_packets or
+            features.get('Total Length of Bwd Packets', 0) > thresholds.total_bwd_packets):
         return 'throughput_anomaly'
 
     # Check unusual header length
-    if (features.get('Fwd Header Length', 0) > thresholds['unusual_header_length']['fwd_header_length'] or
-            features.get('Bwd Header Length', 0) > thresholds['unusual_header_length']['bwd_header_length']):
+    if (features.get('Fwd Header Length', 0) > thresholds.fwd_header_length or
+            features.get('Bwd Header Length', 0) > thresholds.bwd_header_length):
         return 'header_length'
 
     # Check unusual packet size
-    if (features.get('Max Packet Length', 0) > thresholds['unusual_packet_size']['max_packet_length'] or
-            features.get('Packet Length Mean', 0) > thresholds['unusual_packet_size']['packet_length_mean']):
+    if (features.get('Max Packet Length', 0) > thresholds.max_packet_length or
+            features.get('Packet Length Mean', 0) > thresholds.packet_length_mean):
         return 'packet_size'
 
     # Check unusual flow duration
-    if features.get('Flow Duration', 0) > thresholds['unusual_flow_duration']['flow_duration']:
+    if features.get('Flow Duration', 0) > thresholds.flow_duration:
         return 'flow_duration'
 
     # No specific type identified
     return None
 
 
+@functools.lru_cache(maxsize=4)
+def _rule_layout(thresholds):
+    """Column gather order, per-column limits and rule start offsets for a threshold snapshot"""
+    columns, limits, starts = [], [], []
+    for rule in _RULES:
+        starts.append(len(columns))
+        for feature, threshold in rule:
+            columns.append(Config.RCA_TYPE1_FEATURE_INDEX[feature])
+            limits.append(getattr(thresholds, threshold))
+    return np.array(columns), np.array(limits, dtype=np.float64), np.array(starts)
+
+
+def classify_anomaly_type_batch(mat, thresholds):
+    """Classify many flows at once; vectorized classify_anomaly_type
+
+    mat is an (N, 9) array with columns in Config.RCA_TYPE1_FEATURES order.
+    Returns (codes, labels): int8 indexes into ANOMALY_TYPES (-1 when no rule
+    matches) and the matching anomaly type names (None when no rule matches).
+    """
+    # float64, like the Python-number thresholds, so results match classify_anomaly_type
+    mat = np.asarray(mat, dtype=np.float64).reshape(-1, len(Config.RCA_TYPE1_FEATURES))
+    columns, limits, starts = _rule_layout(thresholds)
+
+    # Every threshold checked in one comparison pass, then OR-ed per rule
+    exceeded = mat[:, columns] > limits
+    matched = np.logical_or.reduceat(exceeded, starts, axis=1)
+
+    # First matching rule wins, as in classify_anomaly_type
+    codes = np.where(matched.any(axis=1), matched.argmax(axis=1), -1).astype(np.int8)
+
+    # Index -1 picks the trailing None
+    return codes, _ANOMALY_TYPE_LABELS[codes]
+
+
 def forward_to_response1(log_id, anomaly_type, re_features):
     """Forward to trigger_response1 route"""
     try:
-        from routes.trigger_response import trigger_response1_internal
         return trigger_response1_internal(log_id, anomaly_type, re_features)
 
     except Exception as e:
@@ -88,47 +186,39 @@ def forward_to_response1(log_id, anomaly_type, re_features):
         return {'error': str(e)}
 
 
-def get_rule_statistics():
-    """Get statistics about rule-based classifications"""
+def _type1_counts():
+    """Response counts per anomaly type 1 (plus total) from one grouped query"""
+    session = get_db_session()
     try:
-        from db.database import get_db_session, close_db_session
-        from db.models.response import Response
-
-        session = get_db_session()
-
-        # Count responses by anomaly type 1
-        type1_stats = {}
-
-        bandwidth_count = session.query(Response).filter(
-            Response.anomaly_type1 == 'bandwidth_saturation'
-        ).count()
+        counts = dict(
+            session.query(Response.anomaly_type1, func.count(Response.id))
+            .filter(Response.anomaly_type1.in_(ANOMALY_TYPES))
+            .group_by(Response.anomaly_type1)
+            .all()
+        )
+    finally:
+        close_db_session(session)
 
-        throughput_count = session.query(Response).filter(
-            Response.anomaly_type1 == 'throughput_anomaly'
-        ).count()
+    type1_stats = {anomaly_type: counts.get(anomaly_type, 0) for anomaly_type in ANOMALY_TYPES}
+    type1_stats['total'] = sum(counts.values())
+    return type1_stats
 
-        header_count = session.query(Response).filter(
-            Response.anomaly_type1 == 'header_length'
-        ).count()
 
-        packet_count = session.query(Response).filter(
-            Response.anomaly_type1 == 'packet_size'
-        ).count()
+def forward_to_response1_batch(items):
+    """Forward many (log_id, anomaly_type, re_features) items to the Type 1 response batch"""
+    try:
+        return trigger_response1_batch(items)
 
-        duration_count = session.query(Response).filter(
-            Response.anomaly_type1 == 'flow_duration'
-        ).count()
+    except Exception as e:
+        logger.error(f"Error forwarding to response1: {str(e)}")
+        return [{'error': str(e)} for _ in items]
 
-        type1_stats = {
-            'bandwidth_saturation': bandwidth_count,
-            'throughput_anomaly': throughput_count,
-            'header_length': header_count,
-            'packet_size': packet_count,
-            'flow_duration': duration_count,
-            'total': bandwidth_count + throughput_count + header_count + packet_count + duration_count
-        }
 
-        close_db_session(session)
+def get_rule_statistics():
+    """Get statistics about rule-based classifications"""
+    try:
+        # Count responses by anomaly type 1 (cached briefly, cleared on writes)
+        type1_stats = dict(stats_cache.get_or_set('type1_counts', _type1_counts))
 
         return {
             'success': True,
@@ -196,7 +286,7 @@ def test_rule_classification():
         results = []
 
         for test_case in test_cases:
-            classified_type = classify_anomaly_type(test_case['features'], Config.RCA_TYPE1_THRESHOLDS)
+            classified_type = classify_anomaly_type(test_case['features'], Config.RCA_TYPE1)
 
             results.append({
                 'test_name': test_case['name'],
@@ -205,9 +295,29 @@ def test_rule_classification():
                                   (test_case['name'] == 'normal_traffic' and classified_type is None)
             })
 
+        # Values just above each limit: the batch classifier must agree with the scalar one
+        boundary_results = []
+        for anomaly_type, rule in zip(ANOMALY_TYPES, _RULES):
+            for feature, threshold in rule:
+                features = dict.fromkeys(Config.RCA_TYPE1_FEATURES, 0.0)
+                features[feature] = float(np.nextafter(getattr(Config.RCA_TYPE1, threshold), np.inf))
+
+                scalar_type = classify_anomaly_type(features, Config.RCA_TYPE1)
+                _, labels = classify_anomaly_type_batch([list(features.values())], Config.RCA_TYPE1)
+
+                boundary_results.append({
+                    'feature': feature,
+                    'value': features[feature],
+                    'classified_as': scalar_type,
+                    'batch_classified_as': labels[0],
+                    'expected_match': scalar_type == labels[0] == anomaly_type
+                })
+
         return {
             'test_successful': True,
             'test_results': results,
+            'boundary_results': boundary_results,
+            'batch_matches_scalar': all(result['expected_match'] for result in boundary_results),
             'thresholds_tested': Config.RCA_TYPE1_THRESHOLDS
         }
 
@@ -8,58 +8,125 @@ import logging
 import random
 from datetime import datetime
 
+from sqlalchemy import func
+
 from config import Config
 from db.database import get_db_session, close_db_session
 from db.models.events import Event
+from db.models.response import Response
+from routes.trigger_response import trigger_response2_internal
+from utils.core import stats_cache
 
 logger = logging.getLogger(__name__)
 
+# Network troubleshooting anomaly types, in check order
+ANOMALY_TYPES = ('high_latency', 'high_error_rates', 'connectivity_issues', 'packet_loss', 'flapping_links')
+
+# log_ids per SELECT ... WHERE log_id IN (...), well under SQLite's bind-variable limit
+LOOKUP_BATCH_SIZE = 500
+
 
 def analyze_network_troubleshooting(log_id):
     """Analyze network issues using device troubleshooting"""
+    return analyze_network_troubleshooting_batch([log_id])[0]
+
+
+def analyze_network_troubleshooting_batch(log_ids):
+    """Analyze many anomalous flows; their events are loaded in batched queries
+
+    Returns one analyze_network_troubleshooting-style result per log_id, in order.
+    """
+    return respond_to_diagnoses(log_ids, diagnose_network_issues(log_ids))
+
+
+def diagnose_network_issues(log_ids):
+    """Load the flows' events and run the troubleshooting checks for each
+
+    Events are fetched with one query per LOOKUP_BATCH_SIZE log_ids.
+    No response is triggered, so this can run alongside RCA Type 1. Returns one
+    diagnosis per log_id, in order: {'target_device', 'troubleshoot_result'}, or
+    an error result.
+    """
+    session = get_db_session()
     try:
-        # Get network metadata from database
-        session = get_db_session()
-        event = session.query(Event).filter(Event.log_id == log_id).first()
+        events = {}
+        for start in range(0, len(log_ids), LOOKUP_BATCH_SIZE):
+            batch = log_ids[start:start + LOOKUP_BATCH_SIZE]
+            events.update(
+                (event.log_id, event)
+                for event in session.query(Event).filter(Event.log_id.in_(batch))
+            )
+
+    except Exception as e:
+        logger.error(f"Error in RCA Type 2 analysis: {str(e)}")
+        return [{'success': False, 'error': str(e)} for _ in log_ids]
 
+    finally:
+        close_db_session(session)
+
+    diagnoses = []
+    for log_id in log_ids:
+        event = events.get(log_id)
         if not event:
-            close_db_session(session)
-            return {'success': False, 'error': 'Event not found'}
+            diagnoses.append({'success': False, 'error': 'Event not found'})
+            continue
+        try:
+            # Identify target device and run network troubleshooting simulation
+            target_device = identify_target_device(event.src_ip, event.dst_ip)
+            diagnoses.append({
+                'target_device': target_device,
+                'troubleshoot_result': run_troubleshooting_simulation(target_device, event)
+            })
+        except Exception as e:
+            logger.error(f"Error in RCA Type 2 analysis: {str(e)}")
+            diagnoses.append({'success': False, 'error': str(e)})
 
-        # Identify target device
-        target_device = identify_target_device(event.src_ip, event.dst_ip)
+    return diagnoses
 
-        # Run network troubleshooting simulation
-        troubleshoot_result = run_troubleshooting_simulation(target_device, event)
 
-        close_db_session(session)
+def respond_to_diagnoses(log_ids, diagnoses):
+    """Trigger the Type 2 response for each diagnosed network issue
 
-        if troubleshoot_result['anomaly_type']:
-            logger.info(f"RCA Type 2 - Detected {troubleshoot_result['anomaly_type']} for log_id: {log_id}")
+    Type 2 responses update the record the Type 1 response created, so this runs
+    once RCA Type 1 has finished for the same flows.
+    """
+    results = []
+    for log_id, diagnosis in zip(log_ids, diagnoses):
+        try:
+            results.append(_respond_to_diagnosis(log_id, diagnosis))
+        except Exception as e:
+            logger.error(f"Error in RCA Type 2 analysis: {str(e)}")
+            results.append({'success': False, 'error': str(e)})
+    return results
 
-            # Forward to response system
-            response_result = forward_to_response2(log_id, troubleshoot_result['anomaly_type'])
 
-            return {
-                'success': True,
-                'anomaly_type': troubleshoot_result['anomaly_type'],
-                'target_device': target_device,
-                'troubleshoot_output': troubleshoot_result['output'],
-                'response_triggered': response_result
-            }
-        else:
-            logger.debug(f"RCA Type 2 - No network issues detected for log_id: {log_id}")
-            return {
-                'success': True,
-                'anomaly_type': 'none',
-                'target_device': target_device
-            }
+def _respond_to_diagnosis(log_id, diagnosis):
+    """Build one flow's RCA Type 2 result, forwarding a detected issue to the response system"""
+    if 'error' in diagnosis:
+        return diagnosis
+
+    target_device = diagnosis['target_device']
+    troubleshoot_result = diagnosis['troubleshoot_result']
+
+    if troubleshoot_result['anomaly_type']:
+        logger.info(f"RCA Type 2 - Detected {troubleshoot_result['anomaly_type']} for log_id: {log_id}")
+
+        # Forward to response system
+        response_result = forward_to_response2(log_id, troubleshoot_result['anomaly_type'])
 
-    except Exception as e:
-        logger.error(f"Error in RCA Type 2 analysis: {str(e)}")
         return {
-            'success': False,
-            'error': str(e)
+            'success': True,
+            'anomaly_type': troubleshoot_result['anomaly_type'],
+            'target_device': target_device,
+            'troubleshoot_output': troubleshoot_result['output'],
+            'response_triggered': response_result
+        }
+    else:
+        logger.debug(f"RCA Type 2 - No network issues detected for log_id: {log_id}")
+        return {
+            'success': True,
+            'anomaly_type': 'none',
+            'target_device': target_device
         }
 
 
@@ -249,7 +316,6 @@ def check_interface_flapping(target_device):
 def forward_to_response2(log_id, anomaly_type):
     """Forward to trigger_response2 route"""
     try:
-        from routes.trigger_response import trigger_response2_internal
         return trigger_response2_internal(log_id, anomaly_type)
 
     except Exception as e:
@@ -257,47 +323,29 @@ def forward_to_response2(log_id, anomaly_type):
         return {'error': str(e)}
 
 
-def get_network_statistics():
-    """Get network troubleshooting statistics"""
+def _type2_counts():
+    """Response counts per anomaly type 2 (plus total) from one grouped query"""
+    session = get_db_session()
     try:
-        from db.database import get_db_session, close_db_session
-        from db.models.response import Response
-
-        session = get_db_session()
-
-        # Count responses by anomaly type 2
-        type2_stats = {}
-
-        latency_count = session.query(Response).filter(
-            Response.anomaly_type2 == 'high_latency'
-        ).count()
-
-        error_count = session.query(Response).filter(
-            Response.anomaly_type2 == 'high_error_rates'
-        ).count()
-
-        connectivity_count = session.query(Response).filter(
-            Response.anomaly_type2 == 'connectivity_issues'
-        ).count()
+        counts = dict(
+            session.query(Response.anomaly_type2, func.count(Response.id))
+            .filter(Response.anomaly_type2.in_(ANOMALY_TYPES))
+            .group_by(Response.anomaly_type2)
+            .all()
+        )
+    finally:
+        close_db_session(session)
 
-        packet_loss_count = session.query(Response).filter(
-            Response.anomaly_type2 == 'packet_loss'
-        ).count()
+    type2_stats = {anomaly_type: counts.get(anomaly_type, 0) for anomaly_type in ANOMALY_TYPES}
+    type2_stats['total'] = sum(counts.values())
+    return type2_stats
 
-        flapping_count = session.query(Response).filter(
-            Response.anomaly_type2 == 'flapping_links'
-        ).count()
 
-        type2_stats = {
-            'high_latency': latency_count,
-            'high_error_rates': error_count,
-            'connectivity_issues': connectivity_count,
-            'packet_loss': packet_loss_count,
-            'flapping_links': flapping_count,
-            'total': latency_count + error_count + connectivity_count + packet_loss_count + flapping_count
-        }
-
-        close_db_session(session)
+def get_network_statistics():
+    """Get network troubleshooting statistics"""
+    try:
+        # Count responses by anomaly type 2 (cached briefly, cleared on writes)
+        type2_stats = dict(stats_cache.get_or_set('type2_counts', _type2_counts))
 
         return {
             'success': True,
@@ -9,14 +9,20 @@ import random
 import time
 from datetime import datetime
 
+from sqlalchemy import func
+
 from config import Config
 from db.database import get_db_session, close_db_session
 from db.models.events import Event
 from db.models.response import Response
-from utils.core import generate_anomaly_id
+from db.repository import response_repo
+from utils.core import generate_anomaly_id, stats_cache, send_real_time_update
 
 logger = logging.getLogger(__name__)
 
+# log_ids per SELECT ... WHERE log_id IN (...), well under SQLite's bind-variable limit
+LOOKUP_BATCH_SIZE = 500
+
 
 def trigger_response1_internal(log_id, anomaly_type, re_features):
     """Internal function for RCA Type 1 responses"""
@@ -45,16 +51,15 @@ def trigger_response1_internal(log_id, anomaly_type, re_features):
             src_port=event.src_port,
             dst_port=event.dst_port,
             anomaly_type1=anomaly_type,
+            re_features=re_features or None,
             res_type1=response_result['response_type'],
             success=response_result['success'],
             duration_ms=response_result['duration_ms']
         )
 
-        # Set reFeatures as JSON
-        response.set_features(re_features)
-
         session.add(response)
         session.commit()
+        stats_cache.clear()
 
         close_db_session(session)
 
@@ -74,6 +79,91 @@ def trigger_response1_internal(log_id, anomaly_type, re_features):
         return {'success': False, 'error': str(e)}
 
 
+def trigger_response1_batch(items):
+    """Type 1 responses for many flows; items are (log_id, anomaly_type, re_features)
+
+    Playbooks still run per flow, but the response records are collected and
+    written together with response_repo.create_many (one transaction). Returns
+    one trigger_response1_internal-style result per item, in order.
+    """
+    log_ids = [log_id for log_id, _, _ in items]
+
+    try:
+        # Get network metadata from database
+        session = get_db_session()
+        try:
+            events = {}
+            for start in range(0, len(log_ids), LOOKUP_BATCH_SIZE):
+                batch = log_ids[start:start + LOOKUP_BATCH_SIZE]
+                events.update(
+                    (event.log_id, event)
+                    for event in session.query(Event).filter(Event.log_id.in_(batch))
+                )
+        finally:
+            close_db_session(session)
+
+    except Exception as e:
+        logger.error(f"Error in trigger_response1 batch: {str(e)}")
+        return [{'success': False, 'error': str(e)} for _ in items]
+
+    results = [None] * len(items)
+    rows = []
+    executed = []
+    for index, (log_id, anomaly_type, re_features) in enumerate(items):
+        event = events.get(log_id)
+        if not event:
+            results[index] = {'success': False, 'error': 'Event not found'}
+            continue
+
+        # Execute Type 1 response playbook
+        anomaly_id = generate_anomaly_id()
+        response_result = execute_type1_response(anomaly_type, event)
+        executed.append((index, anomaly_id, response_result))
+
+        # Collect the response record
+        rows.append({
+            'log_id': log_id,
+            'anomaly_id': anomaly_id,
+            'timestamp': datetime.utcnow(),
+            'src_ip': event.src_ip,
+            'dst_ip': event.dst_ip,
+            'src_port': event.src_port,
+            'dst_port': event.dst_port,
+            'anomaly_type1': anomaly_type,
+            're_features': re_features or None,
+            'res_type1': response_result['response_type'],
+            'success': response_result['success'],
+            'duration_ms': response_result['duration_ms']
+        })
+
+    if rows:
+        try:
+            response_repo.create_many(rows)
+            stats_cache.clear()
+        except Exception as e:
+            logger.error(f"Error saving {len(rows)} Type 1 responses: {str(e)}")
+            for index, _, _ in executed:
+                results[index] = {'success': False, 'error': str(e)}
+            return results
+        finally:
+            # Background thread: release its repository session
+            close_db_session()
+
+    for index, anomaly_id, response_result in executed:
+        # Send real-time update
+        send_response_update(anomaly_id, response_result, 'type1')
+
+        logger.info(f"Type 1 response completed for anomaly_id: {anomaly_id}")
+
+        results[index] = {
+            'success': True,
+            'anomaly_id': anomaly_id,
+            'response_result': response_result
+        }
+
+    return results
+
+
 def trigger_response2_internal(log_id, anomaly_type):
     """Internal function for RCA Type 2 responses"""
     try:
@@ -97,6 +187,7 @@ def trigger_response2_internal(log_id, anomaly_type):
             response.success = False
 
         session.commit()
+        stats_cache.clear()
         close_db_session(session)
 
         # Send real-time update
@@ -130,7 +221,7 @@ def execute_type1_response(anomaly_type, event):
             }
 
         # Simulate playbook execution
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
 
         # Simulate execution delay (1-5 seconds)
         execution_delay = random.uniform(1, 5)
@@ -142,14 +233,15 @@ def execute_type1_response(anomaly_type, event):
         # Simulate success/failure (90% success rate)
         success = random.choice([True] * 9 + [False])
 
-        duration_ms = int((time.time() - start_time) * 1000)
+        duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
 
         return {
             'success': success,
             'response_type': response_actions['type'],
             'duration_ms': duration_ms,
             'actions_taken': response_actions['actions'],
-            'playbook_used': playbook_path
+            'playbook_used': str(playbook_path),
+            'playbook_available': Config.PLAYBOOK_EXISTS.get(playbook_path, False)
         }
 
     except Exception as e:
@@ -177,7 +269,7 @@ def execute_type2_response(anomaly_type, response_record):
             }
 
         # Simulate playbook execution
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
 
         # Simulate execution delay (2-8 seconds for network operations)
         execution_delay = random.uniform(2, 8)
@@ -189,14 +281,15 @@ def execute_type2_response(anomaly_type, response_record):
         # Simulate success/failure (85% success rate for network operations)
         success = random.choice([True] * 85 + [False] * 15)
 
-        duration_ms = int((time.time() - start_time) * 1000)
+        duration_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
 
         return {
             'success': success,
             'response_type': response_actions['type'],
             'duration_ms': duration_ms,
             'actions_taken': response_actions['actions'],
-            'playbook_used': playbook_path
+            'playbook_used': str(playbook_path),
+            'playbook_available': Config.PLAYBOOK_EXISTS.get(playbook_path, False)
         }
 
     except Exception as e:
@@ -274,8 +367,6 @@ def get_type2_response_actions(anomaly_type):
 def send_response_update(anomaly_id, response_result, response_type):
     """Send real-time response update via WebSocket"""
     try:
-        from app import send_real_time_update
-
         update_data = {
             'anomaly_id': anomaly_id,
             'response_type': response_type,
@@ -305,7 +396,6 @@ def get_response_statistics():
             success_rate = (successful_responses / total_responses) * 100
 
         # Average duration
-        from sqlalchemy import func
         avg_duration = session.query(func.avg(Response.duration_ms)).scalar() or 0
 
         # Type 1 vs Type 2 counts
@@ -4,14 +4,27 @@ Purpose: Logger, state manager, helper functions
 Dependencies: logging, threading, datetime
 """
 
+import atexit
+import functools
+import hashlib
 import logging
+import logging.handlers
+import queue
 import threading
+import time
 from datetime import datetime
 from pathlib import Path
 import uuid
+import orjson
+from flask import current_app, make_response, request
+
+# Background listener that owns the real (blocking) log handlers
+_log_listener = None
 
 def setup_logger(level='INFO', log_dir=None):
-    """Simple logger setup"""
+    """Logger setup; records are queued and written by a background listener thread"""
+    global _log_listener
+
     # Set third-party loggers to WARNING to reduce noise
     logging.getLogger('watchdog').setLevel(logging.WARNING)
     logging.getLogger('urllib3').setLevel(logging.WARNING)
@@ -20,14 +33,26 @@ def setup_logger(level='INFO', log_dir=None):
     logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)  # Reduce SQL logging
     logging.getLogger('werkzeug').setLevel(logging.WARNING)  # Reduce Flask request logging
 
-    logging.basicConfig(
-        level=getattr(logging, level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(log_dir / 'app.log' if log_dir else 'app.log')
-        ]
-    )
+    if _log_listener is not None:
+        return logging.getLogger('anbd')
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [
+        logging.StreamHandler(),
+        logging.FileHandler(log_dir / 'app.log' if log_dir else 'app.log')
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Callers only enqueue; stream and file I/O happen on the listener thread
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, level.upper()))
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
     return logging.getLogger('anbd')
 
 class StateManager:
@@ -37,6 +62,14 @@ class StateManager:
         self._monitoring = False
         self._lock = threading.Lock()
         self._start_time = None
+        self._metrics = {
+            'totalEvents': 0,
+            'eventsToday': 0,
+            'totalAnomalies': 0,
+            'anomaliesHour': 0,
+            'totalResponses': 0,
+            'successRate': 0
+        }
 
     def is_monitoring(self):
         """Check if monitoring is active"""
@@ -57,6 +90,16 @@ class StateManager:
         with self._lock:
             return 'running' if self._monitoring else 'stopped'
 
+    def set_metrics(self, metrics):
+        """Store the latest dashboard metrics snapshot"""
+        with self._lock:
+            self._metrics = metrics
+
+    def get_metrics(self):
+        """Get the latest dashboard metrics snapshot"""
+        with self._lock:
+            return self._metrics
+
     def get_uptime(self):
         """Get uptime in seconds"""
         with self._lock:
@@ -113,6 +156,21 @@ def safe_float(value, default=0.0):
     except:
         return default
 
+class OrjsonCodec:
+    """json-module stand-in backed by orjson (Socket.IO packets, SQLAlchemy JSON columns)"""
+
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        """Serialize to str; stdlib-only arguments such as separators are ignored"""
+        return orjson.dumps(obj, option=OrjsonCodec.OPTIONS).decode()
+
+    @staticmethod
+    def loads(data, *args, **kwargs):
+        """Parse JSON text or bytes"""
+        return orjson.loads(data)
+
 class SimpleCache:
     """Basic in-memory cache"""
 
@@ -140,6 +198,83 @@ class SimpleCache:
         with self._lock:
             self._cache.clear()
 
+class TTLCache(SimpleCache):
+    """In-memory cache whose entries expire ttl seconds after being set"""
+
+    def __init__(self, ttl=5, max_size=1000):
+        super().__init__(max_size)
+        self._ttl = ttl
+
+    def get(self, key):
+        """Get value from cache, or None once expired"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        """Set value in cache with a fresh expiry"""
+        super().set(key, (time.monotonic() + self._ttl, value))
+
+    def get_or_set(self, key, compute):
+        """Return the cached value, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+def short_cache(max_age=2):
+    """Decorator for frequently polled GET views: reuse the body briefly and send ETags
+
+    A 200 body is cached for max_age seconds per path and query string. Responses
+    carry Cache-Control and a content ETag, and a matching If-None-Match gets 304.
+    """
+
+    def decorator(view):
+        bodies = TTLCache(ttl=max_age, max_size=64)
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.full_path
+            cached = bodies.get(key)
+            if cached is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                cached = (body, hashlib.blake2b(body, digest_size=8).hexdigest(), response.mimetype)
+                bodies.set(key, cached)
+
+            body, etag, mimetype = cached
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = f'max-age={max_age}, public'
+            return response.make_conditional(request)
+
+        return wrapper
+
+    return decorator
+
+# Real-time update sender (main.send_real_time_update), registered by the app at startup
+_update_sender = None
+
+def register_update_sender(sender):
+    """Set the callable background routes use to push real-time updates to clients"""
+    global _update_sender
+    _update_sender = sender
+
+def send_real_time_update(event_type, data):
+    """Push a real-time update through the registered sender; a no-op before registration"""
+    sender = _update_sender
+    if sender is not None:
+        sender(event_type, data)
+
 # Global instances
 state_manager = StateManager()
-cache = SimpleCache()
\ No newline at end of file
+cache = SimpleCache()
+
+# Dashboard statistics (prediction/RCA counts); cleared whenever events or responses are written
+STATS_TTL_SECONDS = 30
+stats_cache = TTLCache(ttl=STATS_TTL_SECONDS, max_size=8)
\ No newline at end of file